@@ -1,7 +1,20 @@
 # app.py
 from flask import Flask, render_template
+import click
 from extensions import db, migrate, jwt, mail
 from config import Config
+from database import configure_database
+from search import include_object
+from mailer import init_email_queue
+from sequences import configure_sequences
+from tokens import init_token_sweeper
+from otp import init_code_store
+from passwords import configure_password_hasher
+from identity import configure_identity
+from catalog import configure_catalog_cache
+from images import configure_image_pipeline
+from assets import configure_assets
+from instrumentation import init_request_timing
 import os
 from flask_cors import CORS
 
@@ -14,6 +27,8 @@ from routes.invoices import invoices_bp
 from routes.admin import admin_bp
 from routes.checkout import checkout_bp
 from routes.reset import reset_bp
+from routes.images import images_bp
+from routes.assets import assets_bp
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -23,10 +38,20 @@ app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'images')
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Initialize extensions
-db.init_app(app)
-migrate.init_app(app, db)
+configure_database(app, db)
+migrate.init_app(app, db, include_object=include_object)
 jwt.init_app(app)
 mail.init_app(app)
+init_email_queue(app)
+configure_sequences(app)
+init_code_store(app)
+configure_password_hasher(app)
+configure_identity(app)
+configure_catalog_cache(app)
+configure_image_pipeline(app)
+configure_assets(app)
+init_request_timing(app)
+init_token_sweeper(app)
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix="/api/auth")          # /api/auth/login
@@ -35,6 +60,8 @@ app.register_blueprint(cart_bp, url_prefix="/api/cart")
 app.register_blueprint(invoices_bp, url_prefix="/api/invoices")
 app.register_blueprint(admin_bp)                                 # /admin/dashboard
 app.register_blueprint(reset_bp, url_prefix="/api/reset")
+app.register_blueprint(images_bp)                                # /img/<w>x<h>/<filename>
+app.register_blueprint(assets_bp)                                # /static/dist/ bundles
 app.register_blueprint(products_bp)             
 app.register_blueprint(checkout_bp)                   # <-- Public API /api/products
 
@@ -75,5 +102,270 @@ def dashboard_page():
 def reset_password_page():
     return render_template("reset_password.html")
 
+# CLI
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """Create and repopulate the product full-text search index."""
+    from search import rebuild_search_index
+    print(f"Indexed {rebuild_search_index()} products")
+
+
+@app.cli.command("rebuild-sales-rollup")
+def rebuild_sales_rollup_command():
+    """Recompute the daily_sales rollup from all invoices."""
+    from reports import rebuild_sales_rollup
+    print(f"Rebuilt {rebuild_sales_rollup()} daily_sales rows")
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Minify, fingerprint and precompress the shared CSS/JS bundles into static/dist."""
+    from assets import build_assets
+
+    for name, (path, size, gz, br) in build_assets(app.static_folder).items():
+        print(f"{name} -> {path}: {size} bytes, {gz} gzip, {br} brotli")
+    print("Restart the app to serve the new bundles")
+
+
+@app.cli.command("import-products")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=None, type=int, help="Rows per transaction.")
+@click.option("--dry-run", is_flag=True, help="Validate only; write nothing.")
+def import_products_command(path, batch_size, dry_run):
+    """Create or update products from a CSV or JSON file (matched on sku)."""
+    from importer import import_products, parse_import
+
+    with open(path, "rb") as f:
+        rows = parse_import(f.read(), "json" if path.lower().endswith(".json") else "csv")
+    report = import_products(rows, batch_size or app.config["IMPORT_BATCH_SIZE"], dry_run)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}")
+    rate = report["rows"] / (report["elapsed_ms"] / 1000) if report["elapsed_ms"] else 0
+    print(f"{report['rows']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+          f"{report['failed']} failed, {report['categories_created']} new categories "
+          f"in {report['elapsed_ms']}ms ({rate:.0f} rows/s){' [dry run]' if dry_run else ''}")
+
+
+@app.cli.command("send-queued-emails")
+def send_queued_emails_command():
+    """Send every due message in the email outbox and exit."""
+    from mailer import drain_outbox
+    print(f"Processed {drain_outbox(app)} queued emails")
+
+
+@app.cli.command("purge-expired-tokens")
+@click.option("--batch-size", default=None, type=int, help="Rows deleted per transaction.")
+def purge_expired_tokens_command(batch_size):
+    """Delete expired and used login, registration and reset tokens."""
+    from tokens import purge_dead_tokens, sweep_metrics
+
+    reclaimed = purge_dead_tokens(batch_size or app.config["TOKEN_GC_BATCH_SIZE"],
+                                  app.config["TOKEN_GC_BATCH_PAUSE_SECONDS"])
+    for table, count in reclaimed.items():
+        print(f"{table}: {count} rows deleted")
+    print(f"{app.config['OTP_STORE']} code store: {app.extensions['otp_store'].purge()} expired codes dropped")
+    print(f"Reclaimed {sweep_metrics['last_reclaimed']} rows in {sweep_metrics['last_duration_ms']}ms")
+
+
+@app.cli.command("mail-sink")
+@click.option("--port", default=1025, help="Port to listen on.")
+def mail_sink_command(port):
+    """Run a local stub SMTP server that prints messages instead of sending them."""
+    from mailer import StubSMTPServer
+
+    def show(message):
+        print(f"--- {message['from']} -> {', '.join(message['to'])}")
+        print(message["data"].decode(errors="replace"))
+
+    print(f"Stub SMTP sink on 127.0.0.1:{port} (set MAIL_SERVER=127.0.0.1 MAIL_PORT={port} MAIL_USE_TLS=false)")
+    StubSMTPServer(port=port, on_message=show).serve_forever()
+
+
+@app.cli.command("stress-invoice-numbers")
+@click.option("--processes", default=8, help="Concurrent worker processes.")
+@click.option("--per-process", default=250, help="Invoices created by each process.")
+@click.option("--block-size", default=None, type=int, help="Numbers reserved per block.")
+def stress_invoice_numbers_command(processes, per_process, block_size):
+    """Allocate invoice numbers from many processes at once and check for duplicates."""
+    import sys
+    import tempfile
+    import time
+    from sequences import stress_invoice_numbers
+
+    block_size = block_size or app.config["INVOICE_NUMBER_BLOCK_SIZE"]
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'stress.db')}"
+        started = time.perf_counter()
+        issued, duplicates, rows = stress_invoice_numbers(url, processes, per_process, block_size)
+        elapsed = time.perf_counter() - started
+
+    print(f"{len(issued)} numbers from {processes} processes in {elapsed:.2f}s "
+          f"({len(issued) / elapsed:.0f}/s), {rows} invoices stored, {duplicates} duplicates")
+    if duplicates or rows != processes * per_process:
+        sys.exit(1)
+
+
+@app.cli.command("bench-line-items")
+@click.option("--lines", default=500, help="Line items per invoice.")
+@click.option("--rounds", default=5, help="Invoices written per path; the best time is reported.")
+def bench_line_items_command(lines, rounds):
+    """Compare per-object and bulk InvoiceItem inserts."""
+    from pricing import benchmark_line_items
+
+    results = benchmark_line_items(lines, rounds)
+    for path, seconds in results.items():
+        print(f"{path:>4}: {seconds * 1000:.1f} ms for {lines} lines ({lines / seconds:.0f} rows/s)")
+    print(f"bulk is {results['orm'] / results['bulk']:.1f}x faster")
+
+
+@app.cli.command("bench-search")
+@click.option("--products", default=100_000, help="Products in the scratch catalog.")
+@click.option("--rounds", default=20, help="Runs per query; median and worst are reported.")
+def bench_search_command(products, rounds):
+    """Time ranked product search on a scratch catalog, ranking every match vs a capped set."""
+    from search import SEARCH_CANDIDATES, benchmark_search
+
+    print(f"{products} products, {rounds} rounds, {SEARCH_CANDIDATES} ranked candidates when capped")
+    for query, result in benchmark_search(products, rounds=rounds).items():
+        print(f"{query!r:>18}: {result['matches']:>6} matches, "
+              f"all {result['all'][0]:.1f}ms (max {result['all'][1]:.1f}), "
+              f"capped {result['capped'][0]:.1f}ms (max {result['capped'][1]:.1f})")
+
+
+@app.cli.command("bench-password-hashing")
+@click.option("--logins", default=40, help="Password checks per run.")
+@click.option("--threads", default=8, help="Concurrent login requests.")
+@click.option("--workers", default=None, type=int, help="Hashing processes (default PASSWORD_HASH_WORKERS).")
+def bench_password_hashing_command(logins, threads, workers):
+    """Compare login throughput and request stalls with inline and pooled hashing."""
+    from passwords import PasswordHasher, benchmark_logins
+
+    method = app.config["PASSWORD_HASH_METHOD"]
+    workers = app.config["PASSWORD_HASH_WORKERS"] if workers is None else workers
+    print(f"{method}, {logins} logins from {threads} threads")
+    for label, pool_size in (("inline", 0), (f"pool({workers})", workers)):
+        hasher = PasswordHasher(method, pool_size)
+        try:
+            rate, p50, worst = benchmark_logins(hasher, logins, threads)
+        finally:
+            hasher.shutdown()
+        print(f"{label:>8}: {rate:.1f} logins/s, other requests delayed p50 {p50:.1f}ms, max {worst:.1f}ms")
+
+
+@app.cli.command("check-queries")
+def check_queries():
+    """Assert product listings cost a constant number of SQL queries."""
+    import sys
+    from flask_jwt_extended import create_access_token
+    from catalog import catalog_cache
+    from instrumentation import assert_max_queries
+    from models import User
+
+    admin = User.query.filter_by(role="admin").first()
+    if admin is None:
+        print("check-queries needs an admin user in the database")
+        sys.exit(1)
+    client = app.test_client()
+    client.set_cookie("access_token_cookie", create_access_token(
+        identity=admin.username, additional_claims={"role": "admin", "uid": admin.id}
+    ))
+    client.get("/api/auth/me")  # load the user into the identity cache
+    catalog_cache.entries.clear()
+    # Catalog endpoints read the catalog version row before anything else, then
+    # run the listing query on a cache miss; a repeat request is a cache hit
+    budgets = [
+        ("/api/auth/me", 0),
+        ("/api/products?limit=100", 2),
+        ("/api/products?limit=100", 1),
+        ("/api/products?limit=100&fields=id,name,category_name", 2),
+        ("/admin/api/products", 1),
+    ]
+    for url, limit in budgets:
+        with assert_max_queries(limit) as counter:
+            resp = client.get(url)
+        print(f"{url}: HTTP {resp.status_code}, {counter.count} queries (budget {limit})")
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans():
+    """Fail when a hot lookup query falls back to a full table scan or a full sort."""
+    import sys
+    from datetime import datetime
+    from models import (Category, DailySales, EmailOutbox, Invoice, InvoiceItem, LoginToken,
+                        Product, RegisterToken, ResetToken, User)
+    from instrumentation import explain_query_plan, table_scans, temp_sorts
+    from pagination import encode_cursor
+    from routes.products import PRODUCT_SORTS, apply_keyset
+
+    now = datetime.utcnow()
+    hot_queries = {
+        "login user": User.query.filter_by(username="u"),
+        "user by email": User.query.filter_by(email="e"),
+        "verify login token": LoginToken.query.filter_by(user_id=1, token="000000"),
+        "verify register token": RegisterToken.query.filter_by(email="e", token="000000"),
+        "latest reset token": ResetToken.query.filter_by(user_id=1, used=False)
+            .order_by(ResetToken.created_at.desc()).limit(1),
+        "reset token by hash": ResetToken.query.filter_by(user_id=1, token_hash="h"),
+        "invoice page": Invoice.query.filter(Invoice.created_at >= now, Invoice.created_at < now)
+            .order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(50),
+        "invoice first page": Invoice.query.order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(50),
+        "customer invoices": Invoice.query.filter_by(username="u").order_by(Invoice.created_at.desc()),
+        "invoice items": InvoiceItem.query.filter_by(invoice_id=1),
+        "hourly revenue": Invoice.query.filter(Invoice.created_at >= now, Invoice.created_at < now),
+        "top products": InvoiceItem.query.join(Invoice, Invoice.id == InvoiceItem.invoice_id)
+            .filter(Invoice.created_at >= now, Invoice.created_at < now),
+        "daily totals": DailySales.query.filter(DailySales.day >= now.date(), DailySales.day <= now.date()),
+        "products in category": Product.query.filter_by(category_id=1),
+        "expired login tokens": LoginToken.query.filter(LoginToken.expires_at < now),
+        "expired register tokens": RegisterToken.query.filter(RegisterToken.expires_at < now),
+        "used reset tokens": ResetToken.query.filter(ResetToken.used.is_(True)),
+        "expired reset tokens": ResetToken.query.filter(ResetToken.used.is_(False), ResetToken.created_at < now),
+        "due emails": EmailOutbox.query.filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+    }
+    # /api/products pages: every sort, past a cursor, on its own and within a category
+    listing = db.session.query(Product.id, Category.name).select_from(Product) \
+        .outerjoin(Category, Product.category_id == Category.id)
+    for sort, (column, _) in PRODUCT_SORTS.items():
+        cursor = encode_cursor(sort, "" if column is Product.name else 0, 1)
+        hot_queries[f"products by {sort}"] = apply_keyset(listing, sort, cursor).limit(25)
+        hot_queries[f"category products by {sort}"] = apply_keyset(
+            listing.filter(Product.category_id == 1), sort, cursor
+        ).limit(25)
+    if db.engine.dialect.name != "sqlite":
+        print("Query plan checks only run against SQLite")
+        return
+
+    failed = False
+    for name, query in hot_queries.items():
+        plan = explain_query_plan(query)
+        problems = table_scans(plan) + temp_sorts(plan)
+        failed = failed or bool(problems)
+        print(f"{'FAIL' if problems else 'ok':>4}  {name}: {'; '.join(plan)}")
+    if failed:
+        sys.exit(1)
+
+
+@app.cli.command("process-images")
+@click.option("--all", "redo", is_flag=True, help="Re-render products that already have variants.")
+def process_images_command(redo):
+    """Render resized WebP/JPEG variants for product images, including legacy uploads."""
+    from images import ImagePipeline
+    from models import Product
+
+    pipeline = ImagePipeline()
+    pipeline.configure(app, 0)  # render inline; the command is the background job
+    query = Product.query.filter(Product.image.isnot(None))
+    if not redo:
+        query = query.filter(Product.image_variants.is_(None))
+    done = missing = 0
+    for product_id, image in query.with_entities(Product.id, Product.image).all():
+        if not os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], image)):
+            missing += 1
+            continue
+        pipeline.submit(product_id, image)
+        done += 1
+    print(f"Rendered variants for {done} products ({missing} image files missing)")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,223 @@
+# assets.py
+import gzip
+import hashlib
+import json
+import os
+import re
+from flask import current_app, url_for
+
+# The CSS and JavaScript shared by every page live in static/src. `flask
+# build-assets` concatenates them into bundles, strips comments and
+# whitespace, and writes each one to static/dist under a content hash next to
+# .gz and .br copies. Templates link bundles through asset_url(), which falls
+# back to the unbuilt sources when there is no manifest (e.g. in development).
+
+# bundle name -> source files in static/src, concatenated in order
+BUNDLES = {
+    "site.css": ["site.css"],
+    "site.js": ["site.js"],
+    "admin.css": ["admin.css"],
+    "admin.js": ["admin.js"],
+}
+MANIFEST = "manifest.json"
+
+
+# -------------------
+# MINIFY
+# -------------------
+# Comments are dropped and string, template and regex literals are swapped
+# for placeholders before any whitespace is touched, then put back verbatim,
+# so the rewrites below only ever see code.
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+PLACEHOLDER_RE = re.compile(r"\x00(\d+)\x00")
+JS_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+JS_REGEX_KEYWORDS = {"return", "typeof", "case", "do", "else", "in", "of", "instanceof",
+                     "new", "delete", "void", "throw", "yield", "await"}
+
+
+def _string_end(text, i):
+    quote, j = text[i], i + 1
+    while j < len(text):
+        if text[j] == "\\":
+            j += 2
+        elif text[j] == quote:
+            return j + 1
+        elif text[j] == "\n":
+            return j  # unterminated; leave the rest alone
+        else:
+            j += 1
+    return len(text)
+
+
+def _template_end(text, i):
+    """End of the `...` literal at i, skipping over ${...} expressions."""
+    j = i + 1
+    while j < len(text):
+        if text[j] == "\\":
+            j += 2
+        elif text[j] == "`":
+            return j + 1
+        elif text.startswith("${", j):
+            depth, j = 1, j + 2
+            while j < len(text) and depth:
+                if text[j] in "'\"":
+                    j = _string_end(text, j)
+                    continue
+                if text[j] == "`":
+                    j = _template_end(text, j)
+                    continue
+                depth += {"{": 1, "}": -1}.get(text[j], 0)
+                j += 1
+        else:
+            j += 1
+    return len(text)
+
+
+def _regex_start(text, i):
+    """Is the / at i a regex literal rather than division? Decided by what precedes it."""
+    j = i - 1
+    while j >= 0 and text[j] in " \t\r\n":
+        j -= 1
+    if j < 0 or text[j] in JS_REGEX_PRECEDERS:
+        return True
+    end = j + 1
+    while j >= 0 and (text[j].isalnum() or text[j] in "_$"):
+        j -= 1
+    return text[j + 1:end] in JS_REGEX_KEYWORDS
+
+
+def _regex_end(text, i):
+    j, in_class = i + 1, False
+    while j < len(text) and text[j] != "\n":
+        if text[j] == "\\":
+            j += 2
+            continue
+        if text[j] == "[":
+            in_class = True
+        elif text[j] == "]":
+            in_class = False
+        elif text[j] == "/" and not in_class:
+            j += 1
+            while j < len(text) and text[j].isalpha():
+                j += 1
+            return j
+        j += 1
+    return i + 1  # no closing slash on this line: it was division after all
+
+
+def _extract_literals(text, js):
+    """(code with comments removed and literals replaced by placeholders, literals)."""
+    code, literals = [], []
+    i = start = 0
+    while i < len(text):
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = len(text) if end < 0 else end + 2
+            replacement = "\n" if js and "\n" in text[i:end] else " "
+        elif js and text.startswith("//", i):
+            end = text.find("\n", i)
+            end = len(text) if end < 0 else end
+            replacement = ""
+        elif text[i] in "'\"" or js and (text[i] == "`" or text[i] == "/" and _regex_start(text, i)):
+            end = {"`": _template_end, "/": _regex_end}.get(text[i], _string_end)(text, i)
+            if end == i + 1 and text[i] == "/":
+                i += 1
+                continue
+            replacement = f"\x00{len(literals)}\x00"
+            literals.append(text[i:end])
+        else:
+            i += 1
+            continue
+        code.append(text[start:i])
+        code.append(replacement)
+        i = start = end
+    code.append(text[start:])
+    return "".join(code), literals
+
+
+def _restore_literals(code, literals):
+    return PLACEHOLDER_RE.sub(lambda m: literals[int(m.group(1))], code)
+
+
+def minify_css(text):
+    text, literals = _extract_literals(text, js=False)
+    text = re.sub(r"\s+", " ", text)
+    text = CSS_PUNCTUATION_RE.sub(r"\1", text)
+    text = text.replace(": ", ":").replace(";}", "}")
+    return _restore_literals(text.strip(), literals)
+
+
+def minify_js(text):
+    # Whitespace only: lines are kept so automatic semicolon insertion still
+    # applies. Multi-line template literals are single placeholders here.
+    text, literals = _extract_literals(text, js=True)
+    lines = (line.strip() for line in text.splitlines())
+    return _restore_literals("\n".join(line for line in lines if line), literals)
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+# -------------------
+# BUILD
+# -------------------
+def _write(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(static_folder):
+    """
+    Build every bundle into <static_folder>/dist and rewrite the manifest.
+    Returns {bundle: (path relative to static, bytes, gzip bytes, brotli bytes)}.
+    """
+    import brotli
+
+    source_dir = os.path.join(static_folder, "src")
+    dist_dir = os.path.join(static_folder, "dist")
+    os.makedirs(dist_dir, exist_ok=True)
+
+    manifest, report = {}, {}
+    for name, sources in BUNDLES.items():
+        stem, ext = os.path.splitext(name)
+        text = "\n".join(open(os.path.join(source_dir, s), encoding="utf-8").read() for s in sources)
+        data = MINIFIERS[ext](text).encode("utf-8")
+        filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        path = os.path.join(dist_dir, filename)
+
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        brotlied = brotli.compress(data, quality=11)
+        _write(path, data)
+        _write(path + ".gz", gzipped)
+        _write(path + ".br", brotlied)
+
+        manifest[name] = f"dist/{filename}"
+        report[name] = (manifest[name], len(data), len(gzipped), len(brotlied))
+
+    # Older bundles are left in place for pages rendered before the deploy
+    _write(os.path.join(dist_dir, MANIFEST), json.dumps(manifest, indent=2).encode())
+    return report
+
+
+# -------------------
+# TEMPLATES
+# -------------------
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, "dist", MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(name):
+    """URL of a built bundle, or of its source file if assets have not been built."""
+    path = current_app.extensions["assets"].get(name) or f"src/{name}"
+    return url_for("static", filename=path)
+
+
+def configure_assets(app):
+    app.extensions["assets"] = load_manifest(app.static_folder)
+    app.add_template_global(asset_url)
@@ -0,0 +1,217 @@
+# catalog.py
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+from flask import Response, make_response, request
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from cache import TTLCache
+from models import VersionStamp
+
+# Every product/category write bumps a single "catalog" version row in the same
+# transaction. Public catalog endpoints turn that version into an ETag and
+# answer revalidations with 304 after one primary-key read, before the listing
+# query runs or anything is serialized. Full responses are kept as JSON bytes
+# per worker and reused while the version row is unchanged, so a write in one
+# gunicorn worker is picked up by every other worker on its next request.
+#
+# Checkout only moves stock, so it bumps a separate "stock" row instead. Stock
+# is left out of the cached payloads; the cart lookup, which needs it live,
+# is validated against both rows.
+CATALOG = "catalog"
+STOCK = "stock"
+
+
+def _bump_version(name):
+    now = datetime.utcnow()
+    bump = update(VersionStamp).where(VersionStamp.name == name) \
+        .values(version=VersionStamp.version + 1, updated_at=now)
+    if db.session.execute(bump).rowcount == 0:
+        dialect_insert = postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+        db.session.execute(
+            dialect_insert(VersionStamp).values(name=name, version=0, updated_at=now)
+            .on_conflict_do_nothing()
+        )
+        db.session.execute(bump)
+
+
+def bump_catalog_version():
+    """Call inside the transaction that changes products or categories."""
+    _bump_version(CATALOG)
+
+
+def bump_stock_version():
+    """Call inside the transaction that only moves stock (checkout)."""
+    _bump_version(STOCK)
+
+
+def catalog_version():
+    """(version, updated_at) of the catalog; (0, None) before the first bump."""
+    row = db.session.execute(
+        select(VersionStamp.version, VersionStamp.updated_at).where(VersionStamp.name == CATALOG)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def stock_versions():
+    """(catalog version, stock version, latest updated_at) in one read."""
+    rows = {row.name: row for row in db.session.execute(
+        select(VersionStamp.name, VersionStamp.version, VersionStamp.updated_at)
+        .where(VersionStamp.name.in_((CATALOG, STOCK)))
+    )}
+    updated = [row.updated_at for row in rows.values() if row.updated_at]
+    return (rows[CATALOG].version if CATALOG in rows else 0,
+            rows[STOCK].version if STOCK in rows else 0,
+            max(updated) if updated else None)
+
+
+def catalog_etag(version):
+    return f"catalog-{version}"
+
+
+def _http_date(updated_at):
+    return updated_at.replace(microsecond=0, tzinfo=timezone.utc) if updated_at else None
+
+
+def _revalidate_every_time(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Let browsers keep the body but check back every time
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+# -------------------
+# RESPONSE CACHE
+# -------------------
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.body = None
+
+
+class CatalogCache:
+    """
+    JSON bodies of successful catalog responses, tagged with the catalog
+    version they were built at. Concurrent misses for the same key wait for
+    one request to build the body instead of all querying the database.
+    """
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.entries = TTLCache(maxsize, ttl)
+        self.version = None
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        if self.version is None or version > self.version:
+            # Catalog changed since we last looked: everything cached is stale
+            self.entries.clear()
+            self.version = version
+            return None
+        if version < self.version:
+            return None  # a request that read the version just before a bump
+        return self.entries.get(key)
+
+    def fill(self, key, version, build):
+        """
+        Return the JSON body for `key`, running `build()` (which returns a
+        response) in at most one thread per key. Returns (body, response);
+        response is None when the body came from another thread or the cache.
+        """
+        flight_key = (key, version)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.body is not None:
+                return flight.body, None
+            return None, build()  # the leader's response was not cacheable
+
+        try:
+            response = build()
+            if response.status_code == 200 and response.mimetype == "application/json":
+                flight.body = response.get_data()
+                if version == self.version:
+                    self.entries.set(key, flight.body)
+            return flight.body, response
+        finally:
+            with self._lock:
+                del self._flights[flight_key]
+            flight.done.set()
+
+
+catalog_cache = CatalogCache()
+
+
+def configure_catalog_cache(app):
+    catalog_cache.entries.maxsize = app.config["CATALOG_CACHE_SIZE"]
+    catalog_cache.entries.ttl = app.config["CATALOG_CACHE_TTL"]
+
+
+def _cache_key():
+    return (request.endpoint, tuple(sorted((request.view_args or {}).items())),
+            tuple(sorted(request.args.items(multi=True))))
+
+
+def conditional_catalog(view):
+    """
+    Serve a GET view with ETag/Last-Modified from the catalog version, reply
+    304 without calling the view when the client's copy is current, and
+    otherwise reuse this worker's cached body for the same URL.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, updated_at = catalog_version()
+        etag = catalog_etag(version)
+        last_modified = _http_date(updated_at)
+
+        if _not_modified(etag, last_modified):
+            response = make_response("", 304)
+        else:
+            key = _cache_key()
+            body = catalog_cache.get(key, version)
+            built = None
+            if body is None:
+                body, built = catalog_cache.fill(key, version, lambda: make_response(view(*args, **kwargs)))
+            if body is None:
+                return built  # errors and other uncacheable responses
+            response = built or Response(body, mimetype="application/json")
+        return _revalidate_every_time(response, etag, last_modified)
+    return wrapper
+
+
+def conditional_stock(view):
+    """
+    Like conditional_catalog for views that also return live stock: the ETag
+    covers the catalog and stock versions, and bodies are never cached.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, stock_version, updated_at = stock_versions()
+        etag = f"{catalog_etag(version)}-stock-{stock_version}"
+        last_modified = _http_date(updated_at)
+
+        if _not_modified(etag, last_modified):
+            response = make_response("", 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        return _revalidate_every_time(response, etag, last_modified)
+    return wrapper
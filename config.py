@@ -2,8 +2,9 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "supersecretkey")
-    SQLALCHEMY_DATABASE_URI = "sqlite:///mini_mart.db"
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///mini_mart.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "supersecretjwtkey")
     UPLOAD_FOLDER = "static/images"
 
@@ -15,9 +16,74 @@ class Config:
     JWT_REFRESH_COOKIE_PATH = "/token/refresh"
     
     # Mail settings — no commas!
-    MAIL_SERVER = 'smtp.gmail.com'   # e.g., Gmail SMTP
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    MAIL_SERVER = os.environ.get("MAIL_SERVER", 'smtp.gmail.com')   # e.g., Gmail SMTP
+    MAIL_PORT = int(os.environ.get("MAIL_PORT", 587))
+    MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", "true").lower() == "true"
     MAIL_USERNAME = '{EMAIL}' # Use a legit gmail
     MAIL_PASSWORD = '{APP_PASSWORD}'  # Use Gmail App Password
     MAIL_DEFAULT_SENDER = '{EMAIL_SENDER}' # Use a legit sender
+
+    # Outbound email queue (see mailer.py)
+    MAIL_QUEUE_WORKERS = int(os.environ.get("MAIL_QUEUE_WORKERS", 2))  # 0 = no background workers
+    MAIL_QUEUE_BATCH_SIZE = 20
+    MAIL_QUEUE_MAX_ATTEMPTS = 6
+    MAIL_QUEUE_BACKOFF_SECONDS = 30          # doubles after every failed attempt
+    MAIL_QUEUE_MAX_BACKOFF_SECONDS = 3600
+    MAIL_QUEUE_LEASE_SECONDS = 300           # reclaim messages stuck in 'sending'
+    MAIL_QUEUE_POLL_SECONDS = 5
+    MAIL_QUEUE_IDLE_SECONDS = 60             # close an unused SMTP connection after this
+
+    # Invoice numbers reserved per worker process at a time (see sequences.py)
+    INVOICE_NUMBER_BLOCK_SIZE = int(os.environ.get("INVOICE_NUMBER_BLOCK_SIZE", 20))
+
+    # Expired/used token sweeper (see tokens.py)
+    TOKEN_GC_INTERVAL_SECONDS = int(os.environ.get("TOKEN_GC_INTERVAL_SECONDS", 600))  # 0 = no background sweeper
+    TOKEN_GC_BATCH_SIZE = 500                # rows deleted per transaction
+    TOKEN_GC_BATCH_PAUSE_SECONDS = 0.05      # let other writers in between batches
+
+    # One-time code store (see otp.py): "db", "memory" (single process) or "file"
+    OTP_STORE = os.environ.get("OTP_STORE", "db")
+    OTP_STORE_DIR = os.environ.get("OTP_STORE_DIR")  # file store; defaults to instance/otp, try /dev/shm/mini_mart_otp
+    OTP_MEMORY_MAXSIZE = 100_000
+
+    # Password hashing (see passwords.py); hashes are upgraded on login when this changes.
+    # The default matches the scrypt hashes Werkzeug has been writing all along
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))  # 0 = hash on the request thread
+    PASSWORD_HASH_MAX_PENDING = None         # queued hash jobs per process; default 4 per worker
+
+    # JWT identity -> user cache (see identity.py)
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))  # seconds other workers may serve stale roles
+
+    # Per-worker cache of public catalog responses (see catalog.py)
+    CATALOG_CACHE_SIZE = 512                 # cached URLs per worker
+    CATALOG_CACHE_TTL = 300                  # seconds; the catalog version check invalidates sooner
+
+    # Uploaded product images (see images.py)
+    IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 1))  # 0 = render variants during the upload request
+    IMAGE_VARIANT_SIZES = {"thumb": 264, "medium": 640, "large": 1200}  # longest side in px
+    IMAGE_QUALITY = 80
+    IMAGE_RESIZE_MAX_SIDE = 2000             # largest /img/<w>x<h>/ render
+    IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR")  # /img/ renders; defaults to instance/image_cache
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+    # Bulk product import (see importer.py)
+    IMPORT_BATCH_SIZE = 1000                 # rows per transaction
+    IMPORT_MAX_ROWS = 100_000                # per request; the CLI has no limit
+    IMPORT_MAX_ERRORS_REPORTED = 1000        # per-row errors returned by the API
+    BATCH_UPDATE_MAX_ROWS = 20_000           # changes per PATCH /admin/api/products/batch
+
+    # Per-request Server-Timing header (see instrumentation.py); off by default since
+    # every client would see it. Stats for /admin/performance are kept either way
+    SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "false").lower() == "true"
+
+    # Database tuning (see database.py)
+    DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL")  # defaults to a read-only pool on the SQLite file
+    DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 10))  # server databases only
+    DATABASE_POOL_RECYCLE = 1800
+    SQLITE_JOURNAL_MODE = "WAL"              # readers no longer block on writers
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))
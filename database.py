@@ -0,0 +1,113 @@
+# database.py
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select
+
+# Engine setup for SQLite in production (WAL, busy timeout, mmap, cache) plus
+# an optional read-only bind. SELECTs issued by a session that has not written
+# anything in its current transaction go to the "read" engine, so catalog and
+# dashboard reads never queue behind checkout writes on the writer's connection.
+READ_BIND = "read"
+_WROTE = "wrote_in_transaction"
+
+
+class RoutingSession(Session):
+    """db.session class: reads go to the read bind until the transaction writes."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and not self._flushing and not self.info.get(_WROTE):
+            reader = self._db.engines.get(READ_BIND)
+            if reader is not None:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_write(state):
+    if not state.is_select:
+        state.session.info[_WROTE] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info[_WROTE] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+@event.listens_for(RoutingSession, "after_rollback")
+def _clear_write(session):
+    session.info.pop(_WROTE, None)
+
+
+# -------------------
+# CONFIGURATION
+# -------------------
+def _is_sqlite(url):
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory(url):
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def sqlite_pragmas(config, read_only=False):
+    pragmas = {
+        "journal_mode": config["SQLITE_JOURNAL_MODE"],
+        "synchronous": config["SQLITE_SYNCHRONOUS"],
+        "busy_timeout": config["SQLITE_BUSY_TIMEOUT_MS"],
+        "mmap_size": config["SQLITE_MMAP_SIZE"],
+        "cache_size": -config["SQLITE_CACHE_SIZE_KB"],  # negative = KiB rather than pages
+        "temp_store": "MEMORY",
+    }
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def _apply_pragmas(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _engine_options(config, url):
+    if _is_sqlite(url):
+        return {}
+    return {
+        "pool_size": config["DATABASE_POOL_SIZE"],
+        "pool_recycle": config["DATABASE_POOL_RECYCLE"],
+        "pool_pre_ping": True,
+    }
+
+
+def configure_database(app, db):
+    """
+    Fill in engine options and the read bind from config, initialise `db` and
+    apply SQLite pragmas to every new connection. Call instead of db.init_app.
+    """
+    config = app.config
+    url = config["SQLALCHEMY_DATABASE_URI"]
+    if url.startswith("postgres://"):  # Heroku-style URLs
+        url = config["SQLALCHEMY_DATABASE_URI"] = "postgresql://" + url[len("postgres://"):]
+
+    read_url = config.get("DATABASE_READ_URL")
+    if not read_url and _is_sqlite(url) and not _is_memory(url):
+        read_url = url  # same file, separate read-only connection pool
+    binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+    if read_url:
+        binds[READ_BIND] = {"url": read_url, **_engine_options(config, read_url)}
+    config["SQLALCHEMY_BINDS"] = binds
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **_engine_options(config, url), **config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+    }
+
+    db.init_app(app)
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == "sqlite":
+                _apply_pragmas(engine, sqlite_pragmas(config, read_only=key == READ_BIND))
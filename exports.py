@@ -0,0 +1,77 @@
+# exports.py
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from extensions import db
+from models import Invoice, InvoiceItem, Product
+
+# Invoice export for accounting: one row per line item (invoices without items
+# get a single row with empty item columns), in created_at order. Rows are
+# fetched from a streaming cursor `chunk_size` at a time and each chunk is
+# encoded and yielded before the next is read, so memory use does not grow
+# with the size of the period.
+
+EXPORT_COLUMNS = (
+    "invoice_id", "invoice_number", "username", "created_at", "total_amount",
+    "item_id", "product_id", "product_name", "quantity", "unit_price", "line_total",
+)
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def invoice_export_query(start_day=None, end_day=None):
+    query = select(
+        Invoice.id, Invoice.invoice_number, Invoice.username, Invoice.created_at, Invoice.total_amount,
+        InvoiceItem.id, InvoiceItem.product_id, Product.name, InvoiceItem.quantity, InvoiceItem.price,
+    ).select_from(Invoice) \
+        .outerjoin(InvoiceItem, InvoiceItem.invoice_id == Invoice.id) \
+        .outerjoin(Product, Product.id == InvoiceItem.product_id)
+    if start_day:
+        query = query.where(Invoice.created_at >= datetime.combine(start_day, datetime.min.time()))
+    if end_day:
+        query = query.where(Invoice.created_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+    return query.order_by(Invoice.created_at, Invoice.id, InvoiceItem.id)
+
+
+def _record(row):
+    invoice_id, number, username, created_at, total, item_id, product_id, name, quantity, price = row
+    return (
+        invoice_id, number, username, created_at.isoformat() if created_at else None,
+        round(total or 0.0, 2), item_id, product_id, name, quantity,
+        round(price, 2) if price is not None else None,
+        round(price * quantity, 2) if item_id is not None else None,
+    )
+
+
+def _csv_chunks(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_record(row) for row in rows)
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(partitions):
+    for rows in partitions:
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, _record(row)))) + "\n" for row in rows)
+
+
+def export_invoices(fmt, start_day=None, end_day=None, chunk_size=1000):
+    """Yield the export as text chunks of about `chunk_size` rows each."""
+    result = db.session.execute(
+        invoice_export_query(start_day, end_day),
+        execution_options={"yield_per": chunk_size}
+    )
+    try:
+        encode = _csv_chunks if fmt == "csv" else _ndjson_chunks
+        yield from encode(result.partitions())
+    finally:
+        result.close()
@@ -0,0 +1,54 @@
+# identity.py
+from collections import namedtuple
+from extensions import db, jwt
+from cache import TTLCache
+from models import User
+
+# Resolves the JWT identity to a user once per USER_CACHE_TTL instead of once per
+# request. Cached values are plain snapshots, not ORM objects, so they are safe
+# to share between requests and threads; load the User row when you need to
+# modify it. The cache is per process: other workers see admin changes after
+# at most USER_CACHE_TTL seconds.
+UserIdentity = namedtuple("UserIdentity", "id username email role is_active")
+
+user_cache = TTLCache(maxsize=1024, ttl=60)
+
+
+def _snapshot(user):
+    return UserIdentity(user.id, user.username, user.email, user.role, user.is_active)
+
+
+@jwt.user_lookup_loader
+def load_user(jwt_header, jwt_data):
+    """current_user for @jwt_required views; tokens carry "uid" since login issues it."""
+    uid = jwt_data.get("uid")
+    key = ("id", uid) if uid is not None else ("username", jwt_data["sub"])
+    cached = user_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if uid is not None:
+        user = db.session.get(User, uid)
+    else:
+        user = User.query.filter_by(username=jwt_data["sub"]).first()
+    if user is None:
+        return None
+    identity = _snapshot(user)
+    user_cache.set(key, identity)
+    return identity
+
+
+def invalidate_user(user_id, *usernames):
+    """
+    Forget a user after it is changed or deleted. Pass every username it was
+    cached under, captured before the commit (a rename leaves the old key).
+    """
+    user_cache.pop(("id", user_id))
+    for username in usernames:
+        user_cache.pop(("username", username))
+
+
+def configure_identity(app):
+    user_cache.maxsize = app.config["USER_CACHE_SIZE"]
+    user_cache.ttl = app.config["USER_CACHE_TTL"]
+    user_cache.clear()
@@ -0,0 +1,314 @@
+# images.py
+import hashlib
+import os
+import re
+import threading
+from flask import current_app, url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import update
+from werkzeug.utils import secure_filename
+from extensions import db
+from catalog import bump_catalog_version
+from models import Product
+from process_pool import ProcessPool
+
+# Uploads are stored once under a name derived from their content, so two
+# different files called "guitar.png" no longer overwrite each other and
+# re-uploading the same file is free. Resized WebP/JPEG variants are rendered
+# in a small process pool after the request returns and recorded on the
+# product; until they exist the catalog keeps serving the original.
+#
+# Any image in the upload folder, legacy names included, can also be fetched
+# resized through /img/<w>x<h>/<filename>. Those renders live in a disk cache
+# that evicts the least recently served files once it grows past its limit.
+
+VARIANT_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+CONTENT_NAME_RE = re.compile(r"^[0-9a-f]{20}\.[a-z0-9]+$")
+
+
+class InvalidImage(Exception):
+    """The source file is not an image Pillow can decode."""
+
+
+def content_name(data, filename):
+    """<sha256 prefix><ext> for an upload, keeping the original extension."""
+    ext = os.path.splitext(secure_filename(filename))[1].lower()
+    return hashlib.sha256(data).hexdigest()[:20] + ext
+
+
+def is_content_name(filename):
+    """True for names made by content_name(), whose bytes can never change."""
+    return CONTENT_NAME_RE.match(filename) is not None
+
+
+def render_variants(source, directory, stem, sizes, quality):
+    """
+    Write every size x format of `source` into `directory` as
+    <stem>-<size name>.<ext>, skipping files that already exist.
+    Returns {size name: {ext: filename}}. Runs in the pool's processes.
+    """
+    variants = {}
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+        for size_name, box in sizes.items():
+            resized = original.copy()
+            resized.thumbnail((box, box), Image.Resampling.LANCZOS)
+            variants[size_name] = {}
+            for ext, fmt in VARIANT_FORMATS.items():
+                filename = f"{stem}-{size_name}.{ext}"
+                path = os.path.join(directory, filename)
+                if not os.path.exists(path):
+                    image = resized
+                    if fmt == "JPEG" and image.mode == "RGBA":
+                        image = Image.new("RGB", image.size, "white")
+                        image.paste(resized, mask=resized.getchannel("A"))
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    image.save(tmp, fmt, quality=quality, optimize=fmt == "JPEG")
+                    os.replace(tmp, path)
+                variants[size_name][ext] = filename
+    return variants
+
+
+def resize_image(source, target, width, height, fmt, quality):
+    """Fit `source` inside width x height (never upscaling) and save it to `target`."""
+    try:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        # Not an image, truncated or corrupt
+        raise InvalidImage(f"{os.path.basename(source)}: {e}") from None
+    if fmt == "JPEG" and image.mode != "RGB":
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, "white")
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    tmp = f"{target}.{os.getpid()}.tmp"
+    image.save(tmp, fmt, quality=quality)
+    os.replace(tmp, target)
+    return os.path.getsize(target)
+
+
+class ImagePipeline:
+    """Renders variants in `workers` spawned processes; workers=0 renders inline."""
+
+    def __init__(self, workers=0):
+        self.configure(None, workers)
+
+    def configure(self, app, workers):
+        self.shutdown()
+        self.app = app
+        self.workers = workers
+        self.pool = ProcessPool(workers)
+
+    def _job(self, image):
+        config = self.app.config
+        return (
+            render_variants,
+            os.path.join(config["UPLOAD_FOLDER"], image),
+            config["UPLOAD_FOLDER"],
+            os.path.splitext(image)[0],
+            config["IMAGE_VARIANT_SIZES"],
+            config["IMAGE_QUALITY"],
+        )
+
+    def run(self, fn, *args):
+        """Run an image job in the pool (or inline) and wait for its result."""
+        return self.pool.run(fn, *args)
+
+    def submit(self, product_id, image):
+        """
+        Render variants for a product's image; the product row is updated when
+        done. Failures are logged, never raised: the product is already saved.
+        """
+        job = self._job(image)
+        if not self.workers:
+            try:
+                self._record(product_id, image, job[0](*job[1:]))
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception("Image variants for product %s (%s) failed: %s", product_id, image, e)
+            return None
+        future = self.pool.submit(*job)
+        future.add_done_callback(lambda f: self._finished(product_id, image, f))
+        return future
+
+    def _finished(self, product_id, image, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.app.logger.error("Image variants for product %s (%s) failed: %s", product_id, image, error)
+            return
+        with self.app.app_context():
+            try:
+                self._record(product_id, image, future.result())
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception("Recording image variants for product %s failed: %s", product_id, e)
+            finally:
+                db.session.remove()
+
+    def _record(self, product_id, image, variants):
+        # Skip if the product was given another image while we were rendering
+        result = db.session.execute(
+            update(Product).where(Product.id == product_id, Product.image == image)
+            .values(image_variants=variants)
+        )
+        if result.rowcount:
+            bump_catalog_version()
+        db.session.commit()
+
+    def shutdown(self):
+        if hasattr(self, "pool"):
+            self.pool.shutdown()
+
+
+image_pipeline = ImagePipeline()
+
+
+# -------------------
+# RESIZE CACHE
+# -------------------
+class ResizeCache:
+    """
+    Resized copies of upload-folder images in `directory`, at most `max_bytes`
+    in total. A file's mtime is bumped whenever it is served, so eviction can
+    drop the least recently used ones. Concurrent requests for the same
+    missing render wait for one thread to produce it.
+    """
+
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        self.configure(directory, max_bytes)
+
+    def configure(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._bytes = None  # estimate for this process; corrected on every eviction
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, source, width, height, ext):
+        # The source's size and mtime are part of the key: replacing a file
+        # produces new renders instead of serving the old ones
+        stat = os.stat(source)
+        key = f"{os.path.basename(source)}|{stat.st_size}|{stat.st_mtime_ns}|{width}x{height}"
+        return os.path.join(self.directory, f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.{ext}")
+
+    def get(self, source, width, height, ext, quality):
+        """Path of the rendered file, resizing `source` first if needed."""
+        target = self.path_for(source, width, height, ext)
+        try:
+            os.utime(target)
+            return target
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            flight = self._flights.get(target)
+            leader = flight is None
+            if leader:
+                flight = self._flights[target] = threading.Event()
+        if not leader:
+            flight.wait()
+            if os.path.exists(target):
+                return target
+            # the leader failed; fall through and try ourselves
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            size = image_pipeline.run(resize_image, source, target, width, height,
+                                      VARIANT_FORMATS[ext], quality)
+        finally:
+            if leader:
+                with self._lock:
+                    del self._flights[target]
+                flight.set()
+        self._added(size)
+        return target
+
+    def _added(self, size):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self.disk_usage()
+            else:
+                self._bytes += size
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target_ratio=0.9):
+        """Delete least recently served files until usage is below target_ratio * max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes * target_ratio:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # another worker evicted it first
+            total -= size
+        with self._lock:
+            self._bytes = total
+        return removed
+
+
+resize_cache = ResizeCache()
+
+
+def configure_image_pipeline(app):
+    image_pipeline.configure(app, app.config["IMAGE_WORKERS"])
+    resize_cache.configure(
+        app.config["IMAGE_CACHE_DIR"] or os.path.join(app.instance_path, "image_cache"),
+        app.config["IMAGE_CACHE_MAX_BYTES"]
+    )
+
+
+# -------------------
+# HELPERS
+# -------------------
+def save_upload(file):
+    """Store an uploaded image under its content hash and return the filename."""
+    if not file or not file.filename:
+        return None
+    data = file.read()
+    if not data or not secure_filename(file.filename):
+        return None
+    filename = content_name(data, file.filename)
+    path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return filename
+
+
+def variant_urls(variants):
+    """{size: {ext: url}} for the JSON APIs, or None before variants exist."""
+    if not variants:
+        return None
+    return {
+        size: {ext: url_for("static", filename="images/" + name) for ext, name in files.items()}
+        for size, files in variants.items()
+    }
@@ -0,0 +1,217 @@
+# importer.py
+import csv
+import io
+import json
+import math
+import time
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.utils import secure_filename
+from extensions import db
+from catalog import bump_catalog_version
+from models import Category, Product
+
+# Bulk product import from a supplier CSV/JSON file. Every row is validated
+# first; valid rows are then written `batch_size` at a time, one transaction
+# and one executemany per batch. Rows with a SKU update the product that
+# already has it (or create it), rows without one are always inserted.
+# Categories are matched by name, ignoring case, and created when missing.
+
+IMPORT_FIELDS = ("sku", "name", "price", "stock", "category", "image")
+
+
+# -------------------
+# PARSE / VALIDATE
+# -------------------
+def parse_import(data, fmt):
+    """Rows (dicts) from CSV text with a header line, or a JSON array / {"products": [...]}."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if fmt == "json":
+        payload = json.loads(data)
+        rows = payload.get("products") if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON array or {"products": [...]}')
+        return rows
+    reader = csv.DictReader(io.StringIO(data))
+    if not reader.fieldnames or "name" not in [f.strip().lower() for f in reader.fieldnames]:
+        raise ValueError("CSV needs a header row with at least: name, price, stock, category")
+    return [{(k or "").strip().lower(): v for k, v in row.items()} for row in reader]
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ""
+
+
+def validate_row(raw):
+    """(values, errors) for one input row."""
+    if not isinstance(raw, dict):
+        return None, ["Row must be an object"]
+    errors = []
+    values = {
+        "sku": _text(raw.get("sku")) or None,
+        "name": _text(raw.get("name")),
+        "category": _text(raw.get("category")),
+        "image": _text(raw.get("image")) or None,
+    }
+
+    if not values["name"]:
+        errors.append("name is required")
+    elif len(values["name"]) > 100:
+        errors.append("name is longer than 100 characters")
+    if values["sku"] and len(values["sku"]) > 64:
+        errors.append("sku is longer than 64 characters")
+    if not values["category"]:
+        errors.append("category is required")
+    elif len(values["category"]) > 100:
+        errors.append("category is longer than 100 characters")
+    if values["image"] and (secure_filename(values["image"]) != values["image"] or len(values["image"]) > 100):
+        errors.append("image must be a plain file name in the upload folder")
+
+    try:
+        values["price"] = float(_text(raw.get("price")))
+        if not math.isfinite(values["price"]) or values["price"] < 0:
+            raise ValueError
+    except ValueError:
+        errors.append("price must be a number >= 0")
+    try:
+        values["stock"] = int(_text(raw.get("stock")))
+        if values["stock"] < 0:
+            raise ValueError
+    except ValueError:
+        errors.append("stock must be a whole number >= 0")
+    return values, errors
+
+
+# -------------------
+# WRITE
+# -------------------
+def _dialect_insert():
+    return postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def category_key(name):
+    """Match key for category names; compared in Python since SQLite's lower() only folds ASCII."""
+    return name.strip().casefold()
+
+
+def resolve_categories(names, create=True):
+    """
+    ({category_key(name): category id}, number of categories created), creating
+    missing categories if `create`.
+    """
+    wanted = {}
+    for name in names:
+        wanted.setdefault(category_key(name), name)
+    if not wanted:
+        return {}, 0
+
+    def lookup():
+        found = {}
+        for name, category_id in db.session.execute(select(Category.name, Category.id).order_by(Category.id)):
+            key = category_key(name)
+            if key in wanted:
+                found.setdefault(key, category_id)
+        return found
+
+    ids = lookup()
+    missing = [wanted[key] for key in wanted if key not in ids]
+    if not missing or not create:
+        return ids, 0
+    created = db.session.execute(
+        _dialect_insert()(Category).on_conflict_do_nothing().returning(Category.id),
+        [{"name": name} for name in missing]
+    ).all()
+    if created:
+        bump_catalog_version()
+    db.session.commit()
+    return lookup(), len(created)
+
+
+def _write_batch(batch, category_ids):
+    """Upsert one batch in the current transaction; returns (inserted, updated)."""
+    skus = [values["sku"] for _, values in batch if values["sku"]]
+    existing = set(db.session.execute(select(Product.sku).where(Product.sku.in_(skus))).scalars()) if skus else set()
+
+    params = [{
+        "sku": values["sku"],
+        "name": values["name"],
+        "price": values["price"],
+        "stock": values["stock"],
+        "category_id": category_ids[category_key(values["category"])],
+        "image": values["image"],
+    } for _, values in batch]
+    keyed = [p for p in params if p["sku"]]
+    unkeyed = [p for p in params if not p["sku"]]
+
+    if keyed:
+        stmt = _dialect_insert()(Product)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={
+                "name": stmt.excluded.name,
+                "price": stmt.excluded.price,
+                "stock": stmt.excluded.stock,
+                "category_id": stmt.excluded.category_id,
+                "image": func.coalesce(stmt.excluded.image, Product.image),
+            }
+        )
+        db.session.execute(stmt, keyed)
+    if unkeyed:
+        db.session.execute(_dialect_insert()(Product), unkeyed)
+    return len(params) - len(existing), len(existing)
+
+
+def import_products(rows, batch_size=1000, dry_run=False):
+    """
+    Validate and import product rows. Returns a report with counts and
+    "errors": [{"row": n, "errors": [...]}], rows numbered from 1.
+    """
+    started = time.monotonic()
+    report = {"rows": len(rows), "inserted": 0, "updated": 0, "categories_created": 0, "failed": 0, "errors": []}
+
+    valid, seen_skus = [], {}
+    for n, raw in enumerate(rows, 1):
+        values, errors = validate_row(raw)
+        if values and values["sku"]:
+            if values["sku"] in seen_skus:
+                errors.append(f"duplicate sku, already on row {seen_skus[values['sku']]}")
+            else:
+                seen_skus[values["sku"]] = n
+        if errors:
+            report["errors"].append({"row": n, "errors": errors})
+        else:
+            valid.append((n, values))
+
+    category_ids, report["categories_created"] = resolve_categories(
+        {values["category"] for _, values in valid}, create=not dry_run
+    )
+    if dry_run:
+        report["categories_created"] = len({category_key(values["category"]) for _, values in valid} - set(category_ids))
+        valid = []
+
+    resolved = []
+    for n, values in valid:
+        if category_key(values["category"]) in category_ids:
+            resolved.append((n, values))
+        else:
+            report["errors"].append({"row": n, "errors": [f"category {values['category']!r} could not be created"]})
+    valid = resolved
+
+    for i in range(0, len(valid), batch_size):
+        batch = valid[i:i + batch_size]
+        try:
+            inserted, updated = _write_batch(batch, category_ids)
+            bump_catalog_version()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            report["errors"].extend({"row": n, "errors": [f"batch failed: {e.__class__.__name__}"]} for n, _ in batch)
+            continue
+        report["inserted"] += inserted
+        report["updated"] += updated
+
+    report["errors"].sort(key=lambda e: e["row"])
+    report["failed"] = len(report["errors"])
+    report["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return report
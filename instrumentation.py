@@ -0,0 +1,275 @@
+# instrumentation.py
+import math
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from flask import before_render_template, has_request_context, request, template_rendered
+from sqlalchemy import event
+from extensions import db
+
+
+class QueryCounter:
+    """Records the SQL statements the current thread executes while active."""
+
+    def __init__(self, engine=None):
+        self.engines = [engine] if engine is not None else None
+        self.statements = []
+        self.thread_id = threading.get_ident()
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # ignore background threads (e.g. the email workers) sharing the engine
+        if threading.get_ident() == self.thread_id:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        if self.engines is None:
+            self.engines = list(db.engines.values())  # default and read binds
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        return False
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """
+    Fail when the wrapped block issues more than `limit` SQL statements.
+
+        with assert_max_queries(2):
+            client.get("/api/products")
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{listing}")
+
+
+# -------------------
+# QUERY PLANS (SQLite)
+# -------------------
+TABLE_SCAN_RE = re.compile(r"^SCAN (\w+)$")
+TEMP_SORT_RE = re.compile(r"^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY$")
+
+
+def explain_query_plan(statement, engine=None):
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a Select (or ORM Query).
+    Bound values are irrelevant to SQLite's plan, so every parameter is NULL.
+    """
+    statement = getattr(statement, "statement", statement)
+    engine = engine or db.engine
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(None for _ in compiled.positiontup or ())
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def table_scans(plan):
+    """Tables the plan reads in full without an index."""
+    return [m.group(1) for m in map(TABLE_SCAN_RE.match, plan) if m]
+
+
+def temp_sorts(plan):
+    """ORDER BY steps the plan sorts in a temporary b-tree instead of reading in index order."""
+    return [line for line in plan if TEMP_SORT_RE.match(line)]
+
+
+# -------------------
+# REQUEST TIMING
+# -------------------
+# Each request records its SQL statement count and time (engine events),
+# template rendering time (Flask signals) and mail enqueue time (timed()); the
+# SMTP sends themselves are recorded as background "mailer" rows. The totals
+# go out in an opt-in Server-Timing header and are aggregated per endpoint
+# for /admin/performance. Streamed responses (e.g. the invoice export) run most
+# of their queries after the headers are sent, so they get no header and are
+# recorded when the response is closed. Aggregates are per process: every
+# worker reports the traffic it served since it started or was last reset.
+
+TIMING_SAMPLES = 200  # recent durations kept per endpoint for percentiles
+TIMINGS_KEY = "mini_mart.timings"  # WSGI environ key; survives into stream_with_context
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.mail_ms = 0.0
+        self.samples = deque(maxlen=TIMING_SAMPLES)
+
+    def to_dict(self, name):
+        samples = sorted(self.samples)
+        return {
+            "endpoint": name,
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2),
+            "p50_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(samples[math.ceil(len(samples) * 0.95) - 1], 2),
+            "max_ms": round(self.max_ms, 2),
+            "total_ms": round(self.total_ms, 1),
+            "avg_sql_count": round(self.sql_count / self.count, 2),
+            "avg_sql_ms": round(self.sql_ms / self.count, 2),
+            "avg_template_ms": round(self.template_ms / self.count, 2),
+            "avg_mail_ms": round(self.mail_ms / self.count, 2),
+        }
+
+
+class TimingRecorder:
+    """Thread-safe per-endpoint aggregates for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.since = datetime.utcnow()
+
+    def record(self, endpoint, total_ms, timings=None, error=False):
+        timings = timings or {}
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.count += 1
+            stats.errors += bool(error)
+            stats.total_ms += total_ms
+            stats.max_ms = max(stats.max_ms, total_ms)
+            stats.sql_count += timings.get("sql_count", 0)
+            stats.sql_ms += timings.get("sql", 0.0)
+            stats.template_ms += timings.get("template", 0.0)
+            stats.mail_ms += timings.get("mail", 0.0)
+            stats.samples.append(total_ms)
+
+    def snapshot(self):
+        """Endpoint rows, most total time first."""
+        with self._lock:
+            rows = [stats.to_dict(name) for name, stats in self.endpoints.items()]
+            since = self.since
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return {"since": since.isoformat(), "endpoints": rows}
+
+
+request_timings = TimingRecorder()
+
+
+def _current_timings():
+    # Only the request's own thread; background workers share the engines.
+    # Kept in the environ rather than g, because stream_with_context runs the
+    # body in a fresh app context (and so a fresh g) for the same request
+    return request.environ.get(TIMINGS_KEY) if has_request_context() else None
+
+
+def _new_timings():
+    return {"started": time.perf_counter(), "sql_count": 0, "sql": 0.0, "template": 0.0, "mail": 0.0, "rendering": []}
+
+
+@contextmanager
+def timed(kind, background=None):
+    """
+    Add the block's duration to the current request's `kind` total. Outside a
+    request, record it as its own `background` row on the performance page.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timings = _current_timings()
+        if timings is not None:
+            timings[kind] += elapsed_ms
+        elif background:
+            request_timings.record(background, elapsed_ms, {kind: elapsed_ms})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_timings() is not None and context is not None:
+        context._timing_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current_timings()
+    started = getattr(context, "_timing_started", None)
+    if timings is not None and started is not None:
+        timings["sql_count"] += 1
+        timings["sql"] += (time.perf_counter() - started) * 1000
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _current_timings()
+    if timings is not None:
+        timings["rendering"].append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    timings = _current_timings()
+    if timings is not None and timings["rendering"]:
+        started = timings["rendering"].pop()
+        if not timings["rendering"]:  # count nested render_template calls once
+            timings["template"] += (time.perf_counter() - started) * 1000
+
+
+def server_timing_header(timings, total_ms):
+    parts = [f'db;dur={timings["sql"]:.1f};desc="{timings["sql_count"]} queries"']
+    if timings["template"]:
+        parts.append(f'tpl;dur={timings["template"]:.1f};desc="templates"')
+    if timings["mail"]:
+        parts.append(f'mail;dur={timings["mail"]:.1f};desc="mail enqueue"')
+    parts.append(f'total;dur={total_ms:.1f}')
+    return ", ".join(parts)
+
+
+def init_request_timing(app):
+    """Time every request; see the REQUEST TIMING notes above."""
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def _start_timing():
+        request.environ[TIMINGS_KEY] = _new_timings()
+
+    def _record(endpoint, timings, status_code):
+        total_ms = (time.perf_counter() - timings["started"]) * 1000
+        request_timings.record(endpoint, total_ms, timings, error=status_code >= 500)
+        return total_ms
+
+    @app.after_request
+    def _finish_timing(response):
+        timings = request.environ.get(TIMINGS_KEY)
+        if timings is None:
+            return response
+        endpoint = request.endpoint or "<unmatched>"
+        if response.is_streamed:
+            # The body has not run yet; record once the server closes it
+            response.call_on_close(lambda: _record(endpoint, timings, response.status_code))
+            return response
+        request.environ.pop(TIMINGS_KEY)
+        total_ms = _record(endpoint, timings, response.status_code)
+        if app.config["SERVER_TIMING_HEADER"]:
+            response.headers["Server-Timing"] = server_timing_header(timings, total_ms)
+        return response
@@ -0,0 +1,286 @@
+# mailer.py
+import secrets
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import formataddr
+from flask_mail import Message
+from sqlalchemy import or_
+from extensions import db, mail
+from instrumentation import timed
+from models import EmailOutbox
+
+# Messages are written to the email_outbox table by request handlers and sent
+# by a small pool of background threads, each holding its own SMTP connection
+# open between messages instead of dialling Gmail once per email.
+
+_wakeup = threading.Event()
+_workers = []
+
+
+# -------------------
+# ENQUEUE
+# -------------------
+def enqueue_email(subject, recipients, body=None, html=None, sender=None, reply_to=None):
+    """Store a message in the outbox and wake the workers; returns the outbox row."""
+    # Request-side "mail" time is the enqueue, outbox commit included (so it
+    # overlaps the db segment); SMTP time is recorded by the workers
+    with timed("mail"):
+        if isinstance(sender, tuple):
+            sender = formataddr(sender)
+        entry = EmailOutbox(
+            subject=subject,
+            recipients=",".join(recipients),
+            body=body,
+            html=html,
+            sender=sender,
+            reply_to=reply_to
+        )
+        db.session.add(entry)
+        db.session.commit()
+    _wakeup.set()
+    return entry
+
+
+def build_message(entry):
+    return Message(
+        subject=entry.subject,
+        recipients=entry.recipients.split(","),
+        body=entry.body,
+        html=entry.html,
+        sender=entry.sender or None,
+        reply_to=entry.reply_to
+    )
+
+
+# -------------------
+# CLAIM / RETRY
+# -------------------
+def claim_batch(config):
+    """
+    Atomically mark up to MAIL_QUEUE_BATCH_SIZE due messages as 'sending' for
+    this caller. Rows left in 'sending' past the lease (crashed worker) are
+    picked up again.
+    """
+    now = datetime.utcnow()
+    token = secrets.token_hex(16)
+    lease_expired = now - timedelta(seconds=config["MAIL_QUEUE_LEASE_SECONDS"])
+
+    due_ids = db.session.query(EmailOutbox.id).filter(
+        or_(
+            (EmailOutbox.status == "pending") & (EmailOutbox.next_attempt_at <= now),
+            (EmailOutbox.status == "sending") & (EmailOutbox.claimed_at < lease_expired)
+        )
+    ).order_by(EmailOutbox.next_attempt_at).limit(config["MAIL_QUEUE_BATCH_SIZE"]).scalar_subquery()
+
+    EmailOutbox.query.filter(EmailOutbox.id.in_(due_ids)).update(
+        {"status": "sending", "claim_token": token, "claimed_at": now},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim_token=token, status="sending").all()
+
+
+def record_failure(entry, error, config):
+    entry.attempts += 1
+    entry.last_error = str(error)[:1000]
+    entry.claim_token = None
+    if entry.attempts >= config["MAIL_QUEUE_MAX_ATTEMPTS"]:
+        entry.status = "failed"
+    else:
+        delay = min(config["MAIL_QUEUE_BACKOFF_SECONDS"] * 2 ** (entry.attempts - 1),
+                    config["MAIL_QUEUE_MAX_BACKOFF_SECONDS"])
+        entry.status = "pending"
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def record_success(entry):
+    entry.status = "sent"
+    entry.attempts += 1
+    entry.sent_at = datetime.utcnow()
+    entry.claim_token = None
+    entry.last_error = None
+
+
+# -------------------
+# WORKERS
+# -------------------
+class SMTPSession:
+    """One reusable SMTP connection, reopened lazily after errors or idling."""
+
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self.connection = None
+        self.last_used = 0.0
+
+    def send(self, message):
+        with timed("mail", background="mailer: smtp send"):
+            if self.connection is None:
+                self.connection = mail.connect().__enter__()
+            self.connection.send(message)
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self.connection is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+
+
+def process_batch(smtp, config):
+    """Send one claimed batch; returns the number of messages handled."""
+    batch = claim_batch(config)
+    for entry in batch:
+        try:
+            smtp.send(build_message(entry))
+        except Exception as e:
+            smtp.close()  # drop a possibly broken connection
+            record_failure(entry, e, config)
+        else:
+            record_success(entry)
+        db.session.commit()
+    return len(batch)
+
+
+def drain_outbox(app):
+    """Synchronously send everything that is currently due; returns the count."""
+    smtp = SMTPSession(idle_timeout=0)
+    total = 0
+    with app.app_context():
+        try:
+            while True:
+                handled = process_batch(smtp, app.config)
+                total += handled
+                if not handled:
+                    break
+        finally:
+            smtp.close()
+            db.session.remove()
+    return total
+
+
+def _worker_loop(app, stop_event):
+    config = app.config
+    smtp = SMTPSession(idle_timeout=config["MAIL_QUEUE_IDLE_SECONDS"])
+    while not stop_event.is_set():
+        handled = 0
+        with app.app_context():
+            try:
+                handled = process_batch(smtp, config)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception("Email worker error: %s", e)
+            finally:
+                if not handled:
+                    smtp.close_if_idle()
+                db.session.remove()
+        if not handled:
+            _wakeup.wait(config["MAIL_QUEUE_POLL_SECONDS"])
+            _wakeup.clear()
+    smtp.close()
+
+
+def start_email_workers(app):
+    """Start MAIL_QUEUE_WORKERS daemon threads draining the outbox."""
+    stop_event = threading.Event()
+    for i in range(app.config["MAIL_QUEUE_WORKERS"]):
+        t = threading.Thread(target=_worker_loop, args=(app, stop_event),
+                             name=f"email-worker-{i}", daemon=True)
+        t.start()
+        _workers.append(t)
+    return stop_event
+
+
+def init_email_queue(app):
+    """
+    Start the worker pool on the first request served by this process, so
+    CLI commands (flask db upgrade, ...) and pre-fork masters never spawn it.
+    """
+    started = threading.Lock()
+
+    @app.before_request
+    def _start_workers_once():
+        if _workers or not app.config["MAIL_QUEUE_WORKERS"]:
+            return
+        with started:
+            if not _workers:
+                start_email_workers(app)
+
+
+# -------------------
+# STUB SMTP SINK (local development / tests)
+# -------------------
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 stub-smtp ready")
+        envelope = {"from": None, "to": []}
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb == "HELO":
+                self.reply("250 stub-smtp")
+            elif verb == "EHLO":
+                self.reply("250-stub-smtp")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                # Accept any credentials; AUTH LOGIN sends the password on a second line
+                if command.upper().startswith("AUTH LOGIN"):
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                envelope = {"from": command[10:].strip(" <>"), "to": []}
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(command[8:].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in self.rfile:
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw[1:] if raw.startswith(b"..") else raw)
+                self.server.record(envelope["from"], envelope["to"], b"".join(data))
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:  # RSET, NOOP and anything else
+                self.reply("250 OK")
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """Accepts SMTP on localhost and keeps messages in memory instead of relaying them."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=1025, on_message=None):
+        super().__init__((host, port), _SinkHandler)
+        self.messages = []
+        self.on_message = on_message
+        self._lock = threading.Lock()
+
+    def record(self, sender, recipients, data):
+        message = {"from": sender, "to": recipients, "data": data}
+        with self._lock:
+            self.messages.append(message)
+        if self.on_message:
+            self.on_message(message)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -0,0 +1,76 @@
+"""Add product_search FTS5 index with sync triggers
+
+Revision ID: 3c1f9a7d2b64
+Revises: 96447bcfa1ef
+Create Date: 2026-10-17 09:12:31.402117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d2b64'
+down_revision = '96447bcfa1ef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE VIRTUAL TABLE product_search USING fts5(
+            name, category_name, category_description,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        )
+    """)
+    op.execute("CREATE VIRTUAL TABLE product_search_vocab USING fts5vocab(product_search, 'row')")
+
+    op.execute("""
+        CREATE TRIGGER product_search_ai AFTER INSERT ON product BEGIN
+            INSERT INTO product_search(rowid, name, category_name, category_description)
+            SELECT new.id, new.name, c.name, c.description
+            FROM (SELECT 1) LEFT JOIN category c ON c.id = new.category_id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER product_search_au AFTER UPDATE OF name, category_id ON product BEGIN
+            DELETE FROM product_search WHERE rowid = old.id;
+            INSERT INTO product_search(rowid, name, category_name, category_description)
+            SELECT new.id, new.name, c.name, c.description
+            FROM (SELECT 1) LEFT JOIN category c ON c.id = new.category_id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER product_search_ad AFTER DELETE ON product BEGIN
+            DELETE FROM product_search WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER category_search_au AFTER UPDATE OF name, description ON category BEGIN
+            DELETE FROM product_search WHERE rowid IN (SELECT id FROM product WHERE category_id = new.id);
+            INSERT INTO product_search(rowid, name, category_name, category_description)
+            SELECT id, name, new.name, new.description FROM product WHERE category_id = new.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER category_search_ad AFTER DELETE ON category BEGIN
+            DELETE FROM product_search WHERE rowid IN (SELECT id FROM product WHERE category_id = old.id);
+            INSERT INTO product_search(rowid, name, category_name, category_description)
+            SELECT id, name, NULL, NULL FROM product WHERE category_id = old.id;
+        END
+    """)
+
+    # Backfill existing catalog
+    op.execute("""
+        INSERT INTO product_search(rowid, name, category_name, category_description)
+        SELECT p.id, p.name, c.name, c.description
+        FROM product p LEFT JOIN category c ON c.id = p.category_id
+    """)
+
+
+def downgrade():
+    for trigger in ("category_search_ad", "category_search_au", "product_search_ad",
+                    "product_search_au", "product_search_ai"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS product_search_vocab")
+    op.execute("DROP TABLE IF EXISTS product_search")
@@ -0,0 +1,47 @@
+"""Widen product_search prefix indexes to 2-8 characters
+
+Prefix queries longer than 4 characters ("guitar"*) otherwise merge the
+doclist of every term they expand to, and bm25 walks that whole merge for
+its IDF. FTS5 cannot change prefix= in place, so the table is recreated
+and backfilled; the sync triggers live on product/category and stay put.
+
+Revision ID: b3e7d1f9c4a6
+Revises: d9b4f2a7e1c3
+Create Date: 2026-10-17 21:04:52.318440
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7d1f9c4a6'
+down_revision = 'd9b4f2a7e1c3'
+branch_labels = None
+depends_on = None
+
+
+def _recreate_search_table(prefix):
+    op.execute("DROP TABLE IF EXISTS product_search_vocab")
+    op.execute("DROP TABLE IF EXISTS product_search")
+    op.execute(f"""
+        CREATE VIRTUAL TABLE product_search USING fts5(
+            name, category_name, category_description,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '{prefix}'
+        )
+    """)
+    op.execute("CREATE VIRTUAL TABLE product_search_vocab USING fts5vocab(product_search, 'row')")
+    op.execute("""
+        INSERT INTO product_search(rowid, name, category_name, category_description)
+        SELECT p.id, p.name, c.name, c.description
+        FROM product p LEFT JOIN category c ON c.id = p.category_id
+    """)
+    op.execute("INSERT INTO product_search(product_search) VALUES ('optimize')")
+
+
+def upgrade():
+    _recreate_search_table('2 3 4 5 6 7 8')
+
+
+def downgrade():
+    _recreate_search_table('2 3 4')
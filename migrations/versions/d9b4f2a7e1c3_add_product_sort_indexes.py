@@ -0,0 +1,34 @@
+"""Add indexes for product listing sorts
+
+Lets the price and name sorts of /api/products (also within one
+category) walk an index in order and seek past the keyset cursor instead
+of sorting the whole table. Check with `flask check-query-plans`.
+
+Revision ID: d9b4f2a7e1c3
+Revises: c5e1a9d3f7b2
+Create Date: 2026-10-17 20:11:37.205884
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b4f2a7e1c3'
+down_revision = 'c5e1a9d3f7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain CREATE INDEX: no table rebuild, so the product_search triggers stay put
+    op.create_index('ix_product_price_id', 'product', ['price', 'id'], unique=False)
+    op.create_index('ix_product_name_id', 'product', ['name', 'id'], unique=False)
+    op.create_index('ix_product_category_id_price_id', 'product', ['category_id', 'price', 'id'], unique=False)
+    op.create_index('ix_product_category_id_name_id', 'product', ['category_id', 'name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_product_category_id_name_id', table_name='product')
+    op.drop_index('ix_product_category_id_price_id', table_name='product')
+    op.drop_index('ix_product_name_id', table_name='product')
+    op.drop_index('ix_product_price_id', table_name='product')
@@ -3,8 +3,7 @@ from datetime import datetime, timedelta
 import hashlib
 import random
 from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
-import secrets
+from passwords import password_hasher
 
 
 # -------------------
@@ -14,7 +13,7 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))  # scrypt hashes are 162 characters
     role = db.Column(db.String(20), default="user")  # 'user' or 'admin'
     is_active = db.Column(db.Boolean, default=True)
 
@@ -23,10 +22,13 @@ class User(db.Model):
     login_tokens = db.relationship("LoginToken", backref="user", lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
 
 class Category(db.Model):
@@ -44,11 +46,23 @@ class Category(db.Model):
 
 
 class Product(db.Model):
+    __table_args__ = (
+        db.Index("ix_product_category_id", "category_id"),
+        db.Index("ix_product_sku", "sku", unique=True),
+        # keyset pagination of /api/products by price and name (see PRODUCT_SORTS)
+        db.Index("ix_product_price_id", "price", "id"),
+        db.Index("ix_product_name_id", "name", "id"),
+        db.Index("ix_product_category_id_price_id", "category_id", "price", "id"),
+        db.Index("ix_product_category_id_name_id", "category_id", "name", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), nullable=True)  # supplier key used by bulk imports
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
     stock = db.Column(db.Integer, nullable=False)
     image = db.Column(db.String(100), nullable=True)
+    image_variants = db.Column(db.JSON, nullable=True)  # {size: {ext: filename}}, see images.py
     category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
 
     def to_dict(self):
@@ -73,6 +87,10 @@ class Order(db.Model):
 
 
 class OrderItem(db.Model):
+    __table_args__ = (
+        db.Index("ix_order_item_order_id", "order_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
@@ -92,6 +110,12 @@ def generate_6digit_token():
 # RESET TOKEN (6 digits)
 # -------------------
 class ResetToken(db.Model):
+    __table_args__ = (
+        db.Index("ix_reset_token_user_id_used_created_at", "user_id", "used", "created_at"),
+        db.Index("ix_reset_token_used_created_at", "used", "created_at"),  # token sweeper
+    )
+    LIFETIME = timedelta(minutes=15)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     token_hash = db.Column(db.String(64), nullable=False)  # SHA-256 hash
@@ -99,7 +123,7 @@ class ResetToken(db.Model):
     used = db.Column(db.Boolean, default=False)
 
     def is_expired(self):
-        return datetime.utcnow() > self.created_at + timedelta(minutes=15)
+        return datetime.utcnow() > self.created_at + ResetToken.LIFETIME
 
     @staticmethod
     def generate_token():
@@ -123,6 +147,11 @@ class ResetToken(db.Model):
 # LOGIN TOKEN (6 digits)
 # -------------------
 class LoginToken(db.Model):
+    __table_args__ = (
+        db.Index("ix_login_token_user_id_token", "user_id", "token"),
+        db.Index("ix_login_token_expires_at", "expires_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     token = db.Column(db.String(6), nullable=False, unique=True)  # 6 digits
@@ -142,6 +171,11 @@ class LoginToken(db.Model):
 # REGISTER TOKEN (6 digits)
 # -------------------
 class RegisterToken(db.Model):
+    __table_args__ = (
+        db.Index("ix_register_token_email_token", "email", "token"),
+        db.Index("ix_register_token_expires_at", "expires_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), nullable=False)
     token = db.Column(db.String(6), nullable=False, unique=True)  # 6 digits
@@ -170,6 +204,11 @@ class RegisterToken(db.Model):
 # INVOICE
 # -------------------
 class Invoice(db.Model):
+    __table_args__ = (
+        db.Index("ix_invoice_created_at_id", "created_at", "id"),
+        db.Index("ix_invoice_username_created_at", "username", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False)
     invoice_number = db.Column(db.String(20), unique=True, nullable=False)
@@ -179,14 +218,75 @@ class Invoice(db.Model):
 
     @staticmethod
     def generate_invoice_number():
-        last_invoice = Invoice.query.order_by(Invoice.id.desc()).first()
-        next_id = 1 if not last_invoice else last_invoice.id + 1
-        return f"INV{next_id:06d}"
+        from sequences import invoice_numbers  # sequences imports this module
+        return f"INV{invoice_numbers.next():06d}"
 
 
 class InvoiceItem(db.Model):
+    __table_args__ = (
+        db.Index("ix_invoice_item_invoice_id", "invoice_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey("invoice.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
\ No newline at end of file
+    price = db.Column(db.Float, nullable=False)
+
+# -------------------
+# SEQUENCES
+# -------------------
+class Sequence(db.Model):
+    """Named counters handed out in blocks by sequences.SequenceAllocator."""
+    __tablename__ = "sequence"
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
+
+class VersionStamp(db.Model):
+    """Change counters for cached data, bumped in the writing transaction (see catalog.py)."""
+    __tablename__ = "version_stamp"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# -------------------
+# DAILY SALES ROLLUP
+# -------------------
+class DailySales(db.Model):
+    """Invoice totals per UTC day and customer, maintained by create_invoice."""
+    __tablename__ = "daily_sales"
+
+    day = db.Column(db.Date, primary_key=True)
+    username = db.Column(db.String(80), primary_key=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# -------------------
+# EMAIL OUTBOX
+# -------------------
+class EmailOutbox(db.Model):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(255), nullable=True)
+    recipients = db.Column(db.Text, nullable=False)  # comma-separated
+    reply_to = db.Column(db.String(255), nullable=True)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    html = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(10), nullable=False, default="pending")  # pending/sending/sent/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
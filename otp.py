@@ -0,0 +1,231 @@
+# otp.py
+import hashlib
+import heapq
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, select, update
+from extensions import db
+from models import LoginToken, RegisterToken, ResetToken, generate_6digit_token
+
+# One-time codes (login, registration, password reset) behind a small store
+# interface. "db" keeps the LoginToken/RegisterToken/ResetToken tables; "memory"
+# and "file" keep codes out of SQLite entirely so the auth flows no longer write
+# to the database file checkout is writing to. Use "file" (optionally on
+# /dev/shm) when several worker processes must see the same codes.
+CODE_TTLS = {
+    "login": timedelta(minutes=10),
+    "register": timedelta(minutes=10),
+    "reset": ResetToken.LIFETIME,
+}
+
+
+def _digest(purpose, key, code):
+    return hashlib.sha256(f"{purpose}:{key}:{code}".encode()).hexdigest()
+
+
+class CodeStore(ABC):
+    """issue() returns a new plain code; consume() checks and burns it in one step."""
+
+    @abstractmethod
+    def issue(self, purpose, key):
+        """Store and return a new code for `key`."""
+
+    @abstractmethod
+    def peek(self, purpose, key, code):
+        """True if the code is currently valid, without using it up."""
+
+    @abstractmethod
+    def consume(self, purpose, key, code):
+        """True (and the code is gone) if it was valid; only one caller can win."""
+
+    def purge(self):
+        """Drop expired codes; returns how many were removed."""
+        return 0
+
+
+# -------------------
+# DATABASE
+# -------------------
+class DatabaseCodeStore(CodeStore):
+    """The original token tables; expired rows are removed by tokens.py."""
+
+    def issue(self, purpose, key):
+        code = generate_6digit_token()
+        expires_at = datetime.utcnow() + CODE_TTLS[purpose]
+        if purpose == "login":
+            db.session.add(LoginToken(user_id=key, token=code, expires_at=expires_at))
+        elif purpose == "register":
+            db.session.add(RegisterToken(email=key, token=code, expires_at=expires_at))
+        else:
+            db.session.add(ResetToken(user_id=key, token_hash=ResetToken.hash_token(code)))
+        db.session.commit()
+        return code
+
+    def _match(self, purpose, key, code):
+        """(model, conditions) selecting the still-valid row for this code."""
+        now = datetime.utcnow()
+        if purpose == "login":
+            return LoginToken, (LoginToken.user_id == key, LoginToken.token == code, LoginToken.expires_at > now)
+        if purpose == "register":
+            return RegisterToken, (RegisterToken.email == key, RegisterToken.token == code,
+                                   RegisterToken.expires_at > now)
+        return ResetToken, (ResetToken.user_id == key, ResetToken.token_hash == ResetToken.hash_token(code),
+                            ResetToken.used.is_(False), ResetToken.created_at > now - ResetToken.LIFETIME)
+
+    def peek(self, purpose, key, code):
+        model, conditions = self._match(purpose, key, code)
+        return db.session.execute(select(model.id).where(*conditions).limit(1)).first() is not None
+
+    def consume(self, purpose, key, code):
+        # One conditional statement, so of two concurrent attempts only the
+        # one whose DELETE/UPDATE actually hits the row succeeds
+        model, conditions = self._match(purpose, key, code)
+        if purpose == "reset":
+            stmt = update(model).where(*conditions).values(used=True)
+        else:
+            stmt = delete(model).where(*conditions)
+        consumed = db.session.execute(stmt, execution_options={"synchronize_session": False}).rowcount > 0
+        db.session.commit()
+        return consumed
+
+
+# -------------------
+# IN-PROCESS MEMORY
+# -------------------
+class MemoryCodeStore(CodeStore):
+    """
+    Codes live in a dict keyed by digest, with a heap ordered by expiry so
+    expired codes are dropped first and, when `maxsize` is reached, the code
+    closest to expiring is evicted. Single process only.
+    """
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._expires = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _pop_heap(self):
+        expires_at, digest = heapq.heappop(self._heap)
+        if self._expires.get(digest) == expires_at:  # skip entries already consumed/replaced
+            del self._expires[digest]
+            return True
+        return False
+
+    def _purge_locked(self, now):
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            removed += self._pop_heap()
+        return removed
+
+    def issue(self, purpose, key):
+        code = generate_6digit_token()
+        now = time.monotonic()
+        expires_at = now + CODE_TTLS[purpose].total_seconds()
+        digest = _digest(purpose, key, code)
+        with self._lock:
+            self._purge_locked(now)
+            while len(self._expires) >= self.maxsize and self._heap:
+                self._pop_heap()
+            self._expires[digest] = expires_at
+            heapq.heappush(self._heap, (expires_at, digest))
+        return code
+
+    def peek(self, purpose, key, code):
+        with self._lock:
+            expires_at = self._expires.get(_digest(purpose, key, code))
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def consume(self, purpose, key, code):
+        with self._lock:
+            expires_at = self._expires.pop(_digest(purpose, key, code), None)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def purge(self):
+        with self._lock:
+            return self._purge_locked(time.monotonic())
+
+    def __len__(self):
+        return len(self._expires)
+
+
+# -------------------
+# FILES (multi-worker)
+# -------------------
+class FileCodeStore(CodeStore):
+    """
+    One empty file per code, named by its digest, with the expiry stored as
+    the file's mtime. Consuming is os.unlink, which exactly one process can win.
+    Put the directory on /dev/shm to keep it in shared memory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, purpose, key, code):
+        return os.path.join(self.directory, _digest(purpose, key, code))
+
+    def issue(self, purpose, key):
+        code = generate_6digit_token()
+        expires_at = time.time() + CODE_TTLS[purpose].total_seconds()
+        path = self._path(purpose, key, code)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        open(tmp, "w").close()
+        os.utime(tmp, (expires_at, expires_at))
+        os.replace(tmp, path)
+        return code
+
+    def peek(self, purpose, key, code):
+        try:
+            return os.stat(self._path(purpose, key, code)).st_mtime > time.time()
+        except FileNotFoundError:
+            return False
+
+    def consume(self, purpose, key, code):
+        path = self._path(purpose, key, code)
+        try:
+            expires_at = os.stat(path).st_mtime
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        return expires_at > time.time()
+
+    def purge(self):
+        now = time.time()
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime <= now:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+# -------------------
+# SETUP
+# -------------------
+def init_code_store(app):
+    """Build the store named by OTP_STORE ("db", "memory" or "file")."""
+    backend = app.config["OTP_STORE"]
+    if backend == "memory":
+        store = MemoryCodeStore(app.config["OTP_MEMORY_MAXSIZE"])
+    elif backend == "file":
+        store = FileCodeStore(app.config["OTP_STORE_DIR"] or os.path.join(app.instance_path, "otp"))
+    elif backend == "db":
+        store = DatabaseCodeStore()
+    else:
+        raise ValueError(f"Unknown OTP_STORE {backend!r}")
+    app.extensions["otp_store"] = store
+    return store
+
+
+def code_store():
+    return current_app.extensions["otp_store"]
@@ -0,0 +1,35 @@
+# pagination.py
+import base64
+import json
+
+# Opaque keyset cursors shared by the paginated list endpoints. A cursor is the
+# last row's sort key plus its id, tagged with the sort it belongs to.
+
+
+def encode_cursor(sort, value, last_id):
+    """Pack the last row's sort key into an opaque, URL-safe cursor."""
+    raw = json.dumps([sort, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """Return (value, last_id) from a cursor, or raise ValueError."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(last_id, int):
+        raise ValueError("Cursor does not match sort order")
+    return value, last_id
+
+
+def parse_limit(raw, default, maximum):
+    """Clamp a ?limit= value into [1, maximum]; raises ValueError on junk."""
+    if raw in (None, ""):
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("Invalid limit")
+    return max(1, min(limit, maximum))
@@ -0,0 +1,128 @@
+# passwords.py
+import statistics
+import threading
+import time
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+from process_pool import ProcessPool
+
+# Password hashing is CPU-bound for hundreds of milliseconds. The hasher runs
+# it in a small process pool so a burst of logins does not stall the other
+# requests a worker is serving, and it reports when a stored hash was made with
+# older parameters so login can upgrade it.
+
+
+def method_prefix(method):
+    """
+    The "method:params" part Werkzeug writes before the salt, with its
+    defaults filled in: "scrypt" -> "scrypt:32768:8:1",
+    "pbkdf2" -> "pbkdf2:sha256:600000".
+    """
+    name, *args = method.split(":")
+    if name == "scrypt" and len(args) in (0, 3):
+        n, r, p = args or (32768, 8, 1)
+        return f"scrypt:{int(n)}:{int(r)}:{int(p)}"
+    if name == "pbkdf2" and len(args) <= 2:
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method {method!r}")
+
+
+class PasswordHasher:
+    """
+    Hash/verify with `method` (a Werkzeug method string, e.g.
+    "scrypt:32768:8:1" or "pbkdf2:sha256:600000") in `workers` processes.
+    workers=0 hashes inline on the calling thread. At most `max_pending` jobs
+    may be queued; further callers wait for a slot.
+    """
+
+    def __init__(self, method="scrypt:32768:8:1", workers=0, max_pending=None):
+        self.configure(method, workers, max_pending)
+
+    def configure(self, method, workers, max_pending=None):
+        self.shutdown()
+        self.method = method
+        self.prefix = method_prefix(method)
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending or max(workers, 1) * 4)
+        self.pool = ProcessPool(workers)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        with self._slots:
+            return self.pool.run(fn, *args)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return bool(password_hash) and password_hash.split("$", 1)[0] != self.prefix
+
+    def shutdown(self):
+        if hasattr(self, "pool"):
+            self.pool.shutdown()
+
+
+password_hasher = PasswordHasher()
+
+
+def configure_password_hasher(app):
+    password_hasher.configure(
+        app.config["PASSWORD_HASH_METHOD"],
+        app.config["PASSWORD_HASH_WORKERS"],
+        app.config["PASSWORD_HASH_MAX_PENDING"]
+    )
+
+
+# -------------------
+# BENCHMARK
+# -------------------
+def benchmark_logins(hasher, logins=40, threads=8, probe_interval=0.005):
+    """
+    Verify `logins` passwords from `threads` threads (one login request each)
+    while a probe thread times a trivial task every `probe_interval` seconds,
+    standing in for the other requests the worker is serving.
+    Returns (logins_per_second, probe_p50_lag_ms, probe_max_lag_ms).
+    """
+    stored = hasher.hash("correct horse")
+    hasher.verify(stored, "warm up")  # start the pool outside the timing
+
+    done = threading.Event()
+    probe_ms = []
+
+    def probe():
+        # How late does a short task finish compared to an idle worker?
+        while not done.is_set():
+            started = time.perf_counter()
+            time.sleep(probe_interval)
+            sum(range(1000))
+            probe_ms.append((time.perf_counter() - started - probe_interval) * 1000)
+
+    remaining = iter(range(logins))
+    counter_lock = threading.Lock()
+
+    def login_worker():
+        while True:
+            with counter_lock:
+                if next(remaining, None) is None:
+                    return
+            hasher.verify(stored, "correct horse")
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    started = time.perf_counter()
+    workers = [threading.Thread(target=login_worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+    return logins / elapsed, statistics.median(probe_ms), max(probe_ms)
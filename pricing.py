@@ -0,0 +1,276 @@
+# pricing.py
+import math
+import time
+from sqlalchemy import case, create_engine, insert, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Invoice, InvoiceItem, Product
+from catalog import bump_catalog_version, bump_stock_version
+
+# Server-side cart pricing. Carts are priced with one IN query and stock is
+# taken with one conditional UPDATE, so a cart of any size costs two statements
+# and concurrent buyers cannot drive stock below zero.
+
+MAX_CART_LINES = 500
+
+
+class CartError(Exception):
+    """Raised for carts that cannot be priced or fulfilled; carries per-item details."""
+
+    def __init__(self, message, items=None, status=400):
+        super().__init__(message)
+        self.message = message
+        self.items = items or []
+        self.status = status
+
+    def to_dict(self):
+        return {"error": self.message, "items": self.items}
+
+
+def normalize_cart(lines):
+    """
+    Collapse cart lines into {product_id: quantity}. Accepts either a list of
+    {"id", "quantity"} dicts (localStorage cart) or a {id: qty} mapping
+    (session cart). Client-sent prices and names are ignored.
+    """
+    if isinstance(lines, dict):
+        lines = [{"id": pid, "quantity": qty} for pid, qty in lines.items()]
+    if not isinstance(lines, list):
+        raise CartError("Cart must be a list of items")
+    if len(lines) > MAX_CART_LINES:
+        raise CartError(f"Cart cannot have more than {MAX_CART_LINES} lines")
+
+    quantities = {}
+    for line in lines:
+        try:
+            product_id = int(line["id"])
+            quantity = int(line.get("quantity", 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise CartError("Every cart item needs a numeric id and quantity")
+        if quantity <= 0:
+            raise CartError("Quantities must be positive", items=[{"id": product_id}])
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+class PricedCart:
+    def __init__(self, lines, missing):
+        self.lines = lines
+        self.missing = missing
+
+    @property
+    def total(self):
+        return round(sum(line["subtotal"] for line in self.lines), 2)
+
+    @property
+    def quantities(self):
+        return {line["id"]: line["quantity"] for line in self.lines}
+
+    def shortages(self):
+        return [{"id": line["id"], "name": line["name"], "requested": line["quantity"], "available": line["stock"]}
+                for line in self.lines if line["stock"] < line["quantity"]]
+
+
+def price_cart(quantities):
+    """Load every product in the cart with a single IN query and price it."""
+    products = {}
+    if quantities:
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(list(quantities))).all()}
+
+    lines = []
+    for product_id, quantity in quantities.items():
+        p = products.get(product_id)
+        if p is None:
+            continue
+        unit_price = float(p.price)
+        lines.append({
+            "id": p.id,
+            "name": p.name,
+            "image": p.image,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "subtotal": round(unit_price * quantity, 2),
+            "stock": p.stock
+        })
+    missing = [pid for pid in quantities if pid not in products]
+    return PricedCart(lines, missing)
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for every cart line in one statement, only if every line
+    has enough. Must run inside the caller's transaction; raises CartError
+    (status 409) when any line is short so the caller can roll back.
+    """
+    if not quantities:
+        return
+    wanted = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock >= wanted)
+        .values(stock=Product.stock - wanted)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        raise CartError("Some items are out of stock", status=409)
+    bump_stock_version()  # cached catalog pages leave stock out; carts read it live
+
+
+def checkout_cart(quantities):
+    """Price a cart and reserve its stock; returns the PricedCart."""
+    priced = price_cart(quantities)
+    if priced.missing:
+        raise CartError("Some products no longer exist",
+                        items=[{"id": pid} for pid in priced.missing], status=409)
+    shortages = priced.shortages()
+    if shortages:
+        raise CartError("Some items are out of stock", items=shortages, status=409)
+    try:
+        reserve_stock(priced.quantities)
+    except CartError as e:
+        # Lost a race with another buyer after pricing; report what we know
+        e.items = priced.shortages() or [{"id": pid} for pid in priced.quantities]
+        raise
+    return priced
+
+
+# -------------------
+# BATCH PRICE / STOCK UPDATES
+# -------------------
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate_change(change):
+    """Error string for one {id, price?, stock?, stock_delta?} change, or None."""
+    if not isinstance(change, dict) or not _is_int(change.get("id")):
+        return "id must be an integer"
+    if not any(k in change for k in ("price", "stock", "stock_delta")):
+        return "nothing to update"
+    if "stock" in change and "stock_delta" in change:
+        return "use either stock or stock_delta"
+    if "price" in change:
+        price = change["price"]
+        if not isinstance(price, (int, float)) or isinstance(price, bool) or not math.isfinite(price) or price < 0:
+            return "price must be a number >= 0"
+    if "stock" in change and not (_is_int(change["stock"]) and change["stock"] >= 0):
+        return "stock must be an integer >= 0"
+    if "stock_delta" in change and not _is_int(change["stock_delta"]):
+        return "stock_delta must be an integer"
+    return None
+
+
+def apply_product_updates(changes):
+    """
+    Apply price/stock changes in one transaction with a single executemany
+    UPDATE. `stock` sets the level, `stock_delta` adjusts it and is refused if
+    it would go below zero. Returns {"updated", "failed", "errors"}, errors
+    being [{"index", "id", "error"}] for the rows that were not applied.
+    """
+    errors, valid, seen = [], {}, set()
+    for index, change in enumerate(changes):
+        error = _validate_change(change)
+        if error is None and change["id"] in seen:
+            error = "duplicate id"
+        if error:
+            errors.append({"index": index, "id": change.get("id") if isinstance(change, dict) else None, "error": error})
+            continue
+        seen.add(change["id"])
+        valid[index] = change
+
+    rows = []
+    if valid:
+        # Bumping first takes the write lock, so the stock read below is what we update
+        bump_catalog_version()
+        current = dict(db.session.execute(
+            select(Product.id, Product.stock)
+            .where(Product.id.in_([c["id"] for c in valid.values()]))
+            .with_for_update()
+        ).all())
+        for index, change in valid.items():
+            pid = change["id"]
+            if pid not in current:
+                errors.append({"index": index, "id": pid, "error": "not_found"})
+                continue
+            row = {"id": pid}
+            if "price" in change:
+                row["price"] = float(change["price"])
+            if "stock" in change:
+                row["stock"] = change["stock"]
+            elif "stock_delta" in change:
+                row["stock"] = current[pid] + change["stock_delta"]
+                if row["stock"] < 0:
+                    errors.append({"index": index, "id": pid, "error": "insufficient_stock", "stock": current[pid]})
+                    continue
+            rows.append(row)
+
+    if rows:
+        # ORM bulk UPDATE by primary key; one executemany per run of rows with the same columns
+        rows.sort(key=lambda row: ("price" in row, "stock" in row))
+        db.session.execute(update(Product), rows)
+        db.session.commit()
+    else:
+        db.session.rollback()
+    errors.sort(key=lambda e: e["index"])
+    return {"updated": len(rows), "failed": len(errors), "errors": errors}
+
+
+# -------------------
+# LINE ITEMS
+# -------------------
+def insert_line_items(model, parent_column, parent_id, lines, session=None):
+    """
+    Write priced cart lines as InvoiceItem/OrderItem rows with one executemany
+    INSERT instead of one ORM object per line. Runs in the caller's transaction
+    and does not populate the parent's `items` collection.
+    """
+    if not lines:
+        return 0
+    session = session or db.session
+    session.execute(insert(model), [{
+        parent_column: parent_id,
+        "product_id": line["id"],
+        "quantity": line["quantity"],
+        "price": line["unit_price"]
+    } for line in lines])
+    return len(lines)
+
+
+def _orm_line_items(session, parent_id, lines):
+    """The per-object path insert_line_items replaced; kept for benchmarking."""
+    for line in lines:
+        session.add(InvoiceItem(invoice_id=parent_id, product_id=line["id"],
+                                quantity=line["quantity"], price=line["unit_price"]))
+
+
+def benchmark_line_items(lines=500, rounds=5):
+    """
+    Time invoice creation with `lines` items through the per-object ORM path and
+    the bulk path, each in its own scratch SQLite database. Returns
+    {"orm": seconds, "bulk": seconds}, the best round for each.
+    """
+    import os
+    import tempfile
+
+    cart = [{"id": i + 1, "quantity": 1 + i % 3, "unit_price": 10.0 + i % 50} for i in range(lines)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in ("orm", "bulk"):
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, path + '.db')}")
+            db.metadata.create_all(engine, tables=[Invoice.__table__, InvoiceItem.__table__])
+            best = None
+            for n in range(rounds):
+                started = time.perf_counter()
+                with Session(engine) as session, session.begin():
+                    invoice = Invoice(username="bench", invoice_number=f"BENCH{n:06d}", total_amount=0)
+                    session.add(invoice)
+                    session.flush()
+                    if path == "orm":
+                        _orm_line_items(session, invoice.id, cart)
+                    else:
+                        insert_line_items(InvoiceItem, "invoice_id", invoice.id, cart, session=session)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            engine.dispose()
+            results[path] = best
+    return results
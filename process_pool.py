@@ -0,0 +1,44 @@
+# process_pool.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# CPU-bound work (password hashing, image resizing) runs in small pools of
+# spawned processes so it does not hold the GIL of the worker serving requests.
+# A pool inherited across fork() (gunicorn preloading) is unusable, so each
+# process starts its own on first use.
+
+
+class ProcessPool:
+    """A lazily started pool of `workers` spawned processes; workers=0 runs jobs inline."""
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args):
+        """Queue `fn(*args)` in the pool; returns its Future. Needs workers > 0."""
+        return self.executor.submit(fn, *args)
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` in the pool (or inline) and wait for its result."""
+        if not self.workers:
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    def shutdown(self):
+        """Stop this process's pool without waiting; queued jobs are cancelled."""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
@@ -0,0 +1,226 @@
+# reports.py
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import DailySales, Invoice, InvoiceItem, Product, Category, User
+
+
+def record_sale(created_at, username, amount):
+    """
+    Add one invoice to the daily_sales rollup. Runs in the caller's session so
+    the rollup commits (or rolls back) together with the invoice.
+    """
+    insert = postgresql.insert if _dialect() == "postgresql" else sqlite.insert
+    stmt = insert(DailySales).values(
+        day=created_at.date(),
+        username=username,
+        total_amount=amount,
+        invoice_count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySales.day, DailySales.username],
+        set_={
+            "total_amount": DailySales.total_amount + stmt.excluded.total_amount,
+            "invoice_count": DailySales.invoice_count + 1
+        }
+    )
+    db.session.execute(stmt)
+
+
+def daily_totals(start_day, end_day, username_filter=None):
+    """
+    Return {date: total} for every day in [start_day, end_day] that has sales,
+    using one range scan over the daily_sales primary key.
+    """
+    query = db.session.query(DailySales.day, func.sum(DailySales.total_amount)) \
+        .filter(DailySales.day >= start_day, DailySales.day <= end_day)
+    if username_filter:
+        query = query.filter(DailySales.username.ilike(f"%{username_filter}%"))
+    return {day: float(total) for day, total in query.group_by(DailySales.day).all()}
+
+
+def day_range(start_day, end_day):
+    day = start_day
+    while day <= end_day:
+        yield day
+        day += timedelta(days=1)
+
+
+def rebuild_sales_rollup():
+    """Recompute daily_sales from the invoice table; returns the row count."""
+    db.session.execute(text("DELETE FROM daily_sales"))
+    db.session.execute(text("""
+        INSERT INTO daily_sales (day, username, total_amount, invoice_count)
+        SELECT date(created_at), username, COALESCE(SUM(total_amount), 0), COUNT(*)
+        FROM invoice
+        WHERE created_at IS NOT NULL
+        GROUP BY date(created_at), username
+    """))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(DailySales).scalar()
+
+
+# -------------------
+# DASHBOARD AGGREGATES
+# -------------------
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def period_bounds(report_type, start=None, end=None, today=None):
+    """
+    Map a report type (daily/weekly/monthly/alltime/custom) to inclusive
+    (start_day, end_day) dates. 'alltime' returns (None, None).
+    Raises ValueError for bad custom dates.
+    """
+    today = today or datetime.utcnow().date()
+    if report_type == "daily":
+        return today, today
+    if report_type == "weekly":
+        return today - timedelta(days=6), today
+    if report_type == "monthly":
+        return today - timedelta(days=29), today
+    if report_type == "custom":
+        if not start or not end:
+            raise ValueError("start and end are required for custom reports")
+        return parse_day(start), parse_day(end)
+    return None, None
+
+
+def parse_day(value):
+    """Accept YYYY-MM-DD or a full ISO timestamp (optionally with Z)."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid date format")
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _bucket(day_column, granularity):
+    """SQL expression mapping a date column to the ISO date its bucket starts on."""
+    if _dialect() == "postgresql":
+        return func.to_char(func.date_trunc(granularity, day_column), "YYYY-MM-DD")
+    if granularity == "week":
+        return func.date(day_column, "weekday 0", "-6 days")  # Monday
+    if granularity == "month":
+        return func.strftime("%Y-%m-01", day_column)
+    return func.date(day_column)
+
+
+def _bucket_start(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_keys(start_day, end_day, granularity):
+    """Every bucket start between two dates, so empty periods chart as 0."""
+    current = _bucket_start(start_day, granularity)
+    while current <= end_day:
+        yield current.isoformat()
+        if granularity == "week":
+            current += timedelta(days=7)
+        elif granularity == "month":
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+
+
+def _rollup_range(query, start_day, end_day):
+    if start_day:
+        query = query.filter(DailySales.day >= start_day)
+    if end_day:
+        query = query.filter(DailySales.day <= end_day)
+    return query
+
+
+def store_counts():
+    """Product, category, user and invoice counts in a single round trip."""
+    row = db.session.query(
+        db.session.query(func.count(Product.id)).scalar_subquery().label("products"),
+        db.session.query(func.count(Category.id)).scalar_subquery().label("categories"),
+        db.session.query(func.count(User.id)).scalar_subquery().label("users"),
+        db.session.query(func.count(Invoice.id)).scalar_subquery().label("invoices"),
+    ).one()
+    return dict(row._mapping)
+
+
+def revenue_summary(start_day, end_day):
+    query = _rollup_range(
+        db.session.query(func.coalesce(func.sum(DailySales.total_amount), 0),
+                         func.coalesce(func.sum(DailySales.invoice_count), 0)),
+        start_day, end_day
+    )
+    revenue, invoices = query.one()
+    return {"revenue": float(revenue), "invoices": int(invoices)}
+
+
+def revenue_series(start_day, end_day, granularity):
+    """Revenue and invoice counts per day/week/month, read from daily_sales."""
+    bucket = _bucket(DailySales.day, granularity).label("bucket")
+    query = _rollup_range(
+        db.session.query(bucket, func.sum(DailySales.total_amount), func.sum(DailySales.invoice_count)),
+        start_day, end_day
+    ).group_by(bucket).order_by(bucket)
+    rows = {b: (float(total), int(count)) for b, total, count in query.all()}
+
+    if start_day is None or end_day is None:
+        if not rows:
+            return {"labels": [], "totals": [], "counts": []}
+        start_day = start_day or date.fromisoformat(min(rows))
+        end_day = end_day or date.fromisoformat(max(rows))
+
+    keys = list(_bucket_keys(start_day, end_day, granularity))
+    return {
+        "labels": keys,
+        "totals": [rows.get(k, (0, 0))[0] for k in keys],
+        "counts": [rows.get(k, (0, 0))[1] for k in keys],
+    }
+
+
+def hourly_series(day):
+    """Revenue per hour for one day; reads the invoice table (the rollup is per day)."""
+    start = datetime.combine(day, datetime.min.time())
+    if _dialect() == "postgresql":
+        hour = func.to_char(Invoice.created_at, "HH24")
+    else:
+        hour = func.strftime("%H", Invoice.created_at)
+    hour = hour.label("hour")
+    rows = db.session.query(hour, func.sum(Invoice.total_amount), func.count(Invoice.id)) \
+        .filter(Invoice.created_at >= start, Invoice.created_at < start + timedelta(days=1)) \
+        .group_by(hour).all()
+    by_hour = {int(h): (float(total), int(count)) for h, total, count in rows}
+    return {
+        "labels": [f"{h:02d}:00" for h in range(24)],
+        "totals": [by_hour.get(h, (0, 0))[0] for h in range(24)],
+        "counts": [by_hour.get(h, (0, 0))[1] for h in range(24)],
+    }
+
+
+def top_customers(start_day, end_day, limit):
+    total = func.sum(DailySales.total_amount).label("total")
+    query = _rollup_range(
+        db.session.query(DailySales.username, total, func.sum(DailySales.invoice_count)),
+        start_day, end_day
+    ).group_by(DailySales.username).order_by(total.desc()).limit(limit)
+    return [{"username": u, "total": float(t), "invoices": int(c)} for u, t, c in query.all()]
+
+
+def top_products(start_day, end_day, limit):
+    revenue = func.sum(InvoiceItem.price * InvoiceItem.quantity).label("revenue")
+    query = db.session.query(
+        InvoiceItem.product_id, Product.name, func.sum(InvoiceItem.quantity), revenue
+    ).join(Invoice, Invoice.id == InvoiceItem.invoice_id) \
+        .outerjoin(Product, Product.id == InvoiceItem.product_id)
+    if start_day:
+        query = query.filter(Invoice.created_at >= datetime.combine(start_day, datetime.min.time()))
+    if end_day:
+        query = query.filter(Invoice.created_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+    query = query.group_by(InvoiceItem.product_id, Product.name).order_by(revenue.desc()).limit(limit)
+    return [{"product_id": pid, "name": name, "quantity": int(qty), "revenue": float(rev)}
+            for pid, name, qty, rev in query.all()]
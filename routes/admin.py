@@ -1,15 +1,35 @@
 # routes/admin.py
-from flask import Blueprint, render_template, request, jsonify, abort
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt
-from werkzeug.utils import secure_filename
 from extensions import db
 from models import User, Product, Category, Invoice
+from serializers import product_query, serialize_product
+from reports import (
+    daily_totals, day_range, period_bounds, parse_day, GRANULARITIES, store_counts,
+    revenue_summary, revenue_series, hourly_series, top_customers, top_products
+)
+from pagination import encode_cursor, decode_cursor, parse_limit
+from exports import EXPORT_FORMATS, export_invoices
+from importer import import_products, parse_import
+from pricing import apply_product_updates
+from instrumentation import request_timings
+from cache import TTLCache
+from identity import invalidate_user
+from catalog import bump_catalog_version
+from images import image_pipeline, save_upload
+from sqlalchemy import and_, or_
 from datetime import datetime, timedelta
-import os
 from functools import wraps
 
 admin_bp = Blueprint("admin", __name__, template_folder='templates')
 
+INVOICE_PAGE_SIZE = 50
+MAX_INVOICE_PAGE_SIZE = 500
+MAX_TOP_N = 50
+EXPORT_CHUNK_SIZE = 1000
+
+dashboard_cache = TTLCache(maxsize=64, ttl=30)
+
 
 # -------------------
 # DECORATORS
@@ -29,16 +49,8 @@ def admin_required(fn):
 # HELPERS
 # -------------------
 def save_image(file):
-    """Save uploaded image securely and return filename."""
-    if not file or not file.filename:
-        return None
-    filename = secure_filename(file.filename)
-    if not filename:
-        return None
-    path = os.path.join("static", "images", filename)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    file.save(path)
-    return filename
+    """Save uploaded image under its content hash and return filename."""
+    return save_upload(file)
 
 
 # -------------------
@@ -51,12 +63,19 @@ def dashboard_page():
     return render_template("admin/dashboard.html")
 
 
+@admin_bp.route("/admin/performance")
+@jwt_required()
+@admin_required
+def performance_page():
+    return render_template("admin/performance.html")
+
+
 @admin_bp.route("/admin/products")
 @jwt_required()
 @admin_required
 def admin_products_page():
     categories = Category.query.all()
-    products = Product.query.order_by(Product.id.desc()).all()
+    products = product_query().order_by(Product.id.desc()).all()
     return render_template("admin/products.html", products=products, categories=categories)
 
 
@@ -82,32 +101,16 @@ def categories():
 @jwt_required()
 @admin_required
 def get_products():
-    products = Product.query.order_by(Product.id.desc()).all()
-    return jsonify([{
-        "id": p.id,
-        "name": p.name,
-        "price": float(p.price),
-        "stock": p.stock,
-        "category_id": p.category_id,
-        "category_name": p.category.name if p.category else None,
-        "image": p.image
-    } for p in products]), 200
+    products = product_query().order_by(Product.id.desc()).all()
+    return jsonify([serialize_product(p) for p in products]), 200
 
 
 @admin_bp.route("/admin/api/products/<int:product_id>", methods=["GET"], strict_slashes=False)
 @jwt_required()
 @admin_required
 def get_product(product_id):
-    p = Product.query.get_or_404(product_id)
-    return jsonify({
-        "id": p.id,
-        "name": p.name,
-        "price": float(p.price),
-        "stock": p.stock,
-        "category_id": p.category_id,
-        "category_name": p.category.name if p.category else None,
-        "image": p.image
-    }), 200
+    p = product_query().filter(Product.id == product_id).first_or_404()
+    return jsonify(serialize_product(p)), 200
 
 
 @admin_bp.route("/admin/api/products", methods=["POST"], strict_slashes=False)
@@ -140,22 +143,71 @@ def add_product():
         image=image_filename
     )
     db.session.add(product)
+    bump_catalog_version()
     db.session.commit()
+    if image_filename:
+        image_pipeline.submit(product.id, image_filename)
 
     return jsonify({
         "message": "Product added",
-        "product": {
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "stock": product.stock,
-            "category_id": product.category_id,
-            "category_name": product.category.name if product.category else None,
-            "image": product.image
-        }
+        "product": serialize_product(product)
     }), 201
 
 
+@admin_bp.route("/admin/api/products/import", methods=["POST"], strict_slashes=False)
+@jwt_required()
+@admin_required
+def import_products_file():
+    """
+    Bulk create/update products from an uploaded CSV or JSON file ("file"),
+    a JSON body, or a text/csv body. ?dry_run=1 only validates.
+    """
+    upload = request.files.get("file")
+    try:
+        if upload and upload.filename:
+            fmt = "json" if upload.filename.lower().endswith(".json") else "csv"
+            rows = parse_import(upload.read(), fmt)
+        elif request.is_json:
+            rows = parse_import(request.get_data(), "json")
+        elif request.mimetype == "text/csv":
+            rows = parse_import(request.get_data(), "csv")
+        else:
+            return jsonify({"error": "Send a CSV/JSON file as 'file', a JSON body, or a text/csv body"}), 400
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not parse import: {e}"}), 400
+
+    max_rows = current_app.config["IMPORT_MAX_ROWS"]
+    if len(rows) > max_rows:
+        return jsonify({"error": f"Too many rows ({len(rows)}), the limit is {max_rows}"}), 400
+
+    dry_run = request.args.get("dry_run", "").lower() in ("1", "true", "yes")
+    report = import_products(rows, current_app.config["IMPORT_BATCH_SIZE"], dry_run)
+    max_errors = current_app.config["IMPORT_MAX_ERRORS_REPORTED"]
+    report["errors_truncated"] = len(report["errors"]) > max_errors
+    report["errors"] = report["errors"][:max_errors]
+    report["dry_run"] = dry_run
+    return jsonify(report), 200
+
+
+@admin_bp.route("/admin/api/products/batch", methods=["PATCH"], strict_slashes=False)
+@jwt_required()
+@admin_required
+def batch_update_products():
+    """
+    Apply [{id, price?, stock?, stock_delta?}, ...] (or {"updates": [...]}) in
+    one transaction. Invalid, unknown or oversold rows are reported, the rest applied.
+    """
+    payload = request.get_json(silent=True)
+    changes = payload.get("updates") if isinstance(payload, dict) else payload
+    if not isinstance(changes, list):
+        return jsonify({"error": 'Expected a JSON array or {"updates": [...]}'}), 400
+    max_rows = current_app.config["BATCH_UPDATE_MAX_ROWS"]
+    if len(changes) > max_rows:
+        return jsonify({"error": f"Too many updates ({len(changes)}), the limit is {max_rows}"}), 400
+
+    return jsonify(apply_product_updates(changes)), 200
+
+
 @admin_bp.route("/admin/api/products/<int:product_id>", methods=["PATCH"], strict_slashes=False)
 @jwt_required()
 @admin_required
@@ -182,22 +234,23 @@ def update_product(product_id):
             return jsonify({"error": "Invalid stock"}), 400
     if category_id is not None:
         p.category_id = int(category_id) if category_id else None
+    new_image = None
     if image_file and image_file.filename:
-        p.image = save_image(image_file)
-
+        new_image = save_image(image_file)
+        if new_image and new_image != p.image:
+            p.image = new_image
+            p.image_variants = None
+        else:
+            new_image = None
+
+    bump_catalog_version()
     db.session.commit()
+    if new_image:
+        image_pipeline.submit(p.id, new_image)
 
     return jsonify({
         "message": "Product updated",
-        "product": {
-            "id": p.id,
-            "name": p.name,
-            "price": p.price,
-            "stock": p.stock,
-            "category_id": p.category_id,
-            "category_name": p.category.name if p.category else None,
-            "image": p.image
-        }
+        "product": serialize_product(p)
     }), 200
 
 
@@ -207,6 +260,7 @@ def update_product(product_id):
 def delete_product(product_id):
     p = Product.query.get_or_404(product_id)
     db.session.delete(p)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"message": f"Product '{p.name}' deleted"}), 200
 
@@ -247,6 +301,7 @@ def get_user(user_id):
 @admin_required
 def update_user(user_id):
     u = User.query.get_or_404(user_id)
+    old_username = u.username
     data = request.get_json() or {}
 
     role = data.get("role")
@@ -258,6 +313,7 @@ def update_user(user_id):
         u.is_active = is_active
 
     db.session.commit()
+    invalidate_user(u.id, old_username, u.username)
     return jsonify({
         "id": u.id,
         "username": u.username,
@@ -272,9 +328,11 @@ def update_user(user_id):
 @admin_required
 def delete_user(user_id):
     u = User.query.get_or_404(user_id)
+    username = u.username
     db.session.delete(u)
     db.session.commit()
-    return jsonify({"message": f"User '{u.username}' deleted"}), 200
+    invalidate_user(user_id, username)
+    return jsonify({"message": f"User '{username}' deleted"}), 200
 
 
 # -------------------
@@ -303,6 +361,7 @@ def add_category():
 
     cat = Category(name=name, description=description or None)
     db.session.add(cat)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"category": cat.to_dict()}), 201
 
@@ -332,6 +391,7 @@ def update_category(id):
     if description is not None:
         cat.description = description or None
 
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"category": cat.to_dict()}), 200
 
@@ -342,6 +402,7 @@ def update_category(id):
 def delete_category(id):
     cat = Category.query.get_or_404(id)
     db.session.delete(cat)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"message": "Category deleted"}), 200
 
@@ -358,60 +419,92 @@ def purchase_report():
     start_date = request.args.get("start")
     end_date = request.args.get("end")
 
-    now = datetime.utcnow()
-    query = Invoice.query
-
-    if username_filter:
-        query = query.filter(Invoice.username.ilike(f"%{username_filter}%"))
-
-    labels = []
-    totals = []
+    if report_type not in ("daily", "weekly", "monthly", "custom") or \
+            (report_type == "custom" and not (start_date and end_date)):
+        return jsonify({"labels": [], "totals": []})
+    try:
+        start_day, end_day = period_bounds(report_type, start_date, end_date)
+    except ValueError:
+        return jsonify({"error": "Invalid date format"}), 400
 
-    def daily_total(start, end):
-        return sum(inv.total_amount for inv in query.filter(
-            Invoice.created_at >= start,
-            Invoice.created_at < end
-        ).all())
+    # One range scan over the daily_sales rollup for the whole period
+    by_day = daily_totals(start_day, end_day, username_filter)
+    days = list(day_range(start_day, end_day))
 
     if report_type == "daily":
-        today_start = datetime(now.year, now.month, now.day)
-        total = daily_total(today_start, today_start + timedelta(days=1))
         labels = ["Today"]
-        totals = [total]
-
-    elif report_type == "weekly":
-        for i in range(6, -1, -1):
-            day = now - timedelta(days=i)
-            start = datetime(day.year, day.month, day.day)
-            end = start + timedelta(days=1)
-            labels.append(start.strftime("%b %d"))
-            totals.append(daily_total(start, end))
-
-    elif report_type == "monthly":
-        for i in range(29, -1, -1):
-            day = now - timedelta(days=i)
-            start = datetime(day.year, day.month, day.day)
-            end = start + timedelta(days=1)
-            labels.append(start.strftime("%b %d"))
-            totals.append(daily_total(start, end))
-
-    elif report_type == "custom" and start_date and end_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace("Z", "+00:00"))
-            end_dt = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
-            current = datetime(start_dt.year, start_dt.month, start_dt.day)
-            while current <= end_dt:
-                start = current
-                end = start + timedelta(days=1)
-                labels.append(start.strftime("%b %d"))
-                totals.append(daily_total(start, end))
-                current += timedelta(days=1)
-        except Exception as e:
-            return jsonify({"error": "Invalid date format"}), 400
+    else:
+        labels = [day.strftime("%b %d") for day in days]
+    totals = [by_day.get(day, 0) for day in days]
 
     return jsonify({"labels": labels, "totals": totals})
 
 
+# -------------------
+# DASHBOARD STATS
+# -------------------
+@admin_bp.route("/admin/api/dashboard/stats", methods=["GET"])
+@jwt_required()
+@admin_required
+def dashboard_stats():
+    """
+    Counts, a revenue time series and top-N lists for the dashboard, all
+    aggregated in SQL. Results are cached briefly per parameter set.
+    """
+    report_type = request.args.get("type", "alltime")
+    granularity = request.args.get("granularity") or ("hour" if report_type == "daily" else "day")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"Invalid granularity, expected one of: {', '.join(GRANULARITIES)}"}), 400
+    try:
+        top_n = max(1, min(int(request.args.get("top", 5)), MAX_TOP_N))
+        start_day, end_day = period_bounds(report_type, request.args.get("start"), request.args.get("end"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if granularity == "hour" and (start_day is None or start_day != end_day):
+        return jsonify({"error": "Hourly granularity needs a single-day range"}), 400
+
+    cache_key = (report_type, granularity, top_n, start_day, end_day)
+    stats = dashboard_cache.get(cache_key)
+    if stats is None:
+        if granularity == "hour":
+            series = hourly_series(start_day)
+        else:
+            series = revenue_series(start_day, end_day, granularity)
+        stats = {
+            "counts": store_counts(),
+            "period": {
+                "type": report_type,
+                "start": start_day.isoformat() if start_day else None,
+                "end": end_day.isoformat() if end_day else None,
+                **revenue_summary(start_day, end_day)
+            },
+            "series": {"granularity": granularity, **series},
+            "top_customers": top_customers(start_day, end_day, top_n),
+            "top_products": top_products(start_day, end_day, top_n)
+        }
+        dashboard_cache.set(cache_key, stats)
+    return jsonify(stats), 200
+
+
+# -------------------
+# PERFORMANCE API
+# -------------------
+@admin_bp.route("/admin/api/performance", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_performance():
+    """Per-endpoint request timings recorded by the worker serving this request."""
+    return jsonify(request_timings.snapshot()), 200
+
+
+@admin_bp.route("/admin/api/performance", methods=["DELETE"])
+@jwt_required()
+@admin_required
+def reset_performance():
+    request_timings.reset()
+    return jsonify({"message": "Performance stats reset"}), 200
+
+
 # -------------------
 # INVOICES API
 # -------------------
@@ -419,14 +512,77 @@ def purchase_report():
 @jwt_required()
 @admin_required
 def get_all_invoices():
-    invoices = Invoice.query.order_by(Invoice.created_at.desc()).all()
-    return jsonify([{
-        "id": inv.id,
-        "invoice_number": inv.invoice_number,
-        "username": inv.username,
-        "total_amount": float(inv.total_amount),
-        "created_at": inv.created_at.isoformat()
-    } for inv in invoices]), 200
+    """Newest-first invoices, keyset paginated, with optional date range and search."""
+    search = (request.args.get("q") or "").strip()
+    try:
+        limit = parse_limit(request.args.get("limit"), INVOICE_PAGE_SIZE, MAX_INVOICE_PAGE_SIZE)
+        start_day = parse_day(request.args["start"]) if request.args.get("start") else None
+        end_day = parse_day(request.args["end"]) if request.args.get("end") else None
+        cursor = request.args.get("cursor")
+        if cursor:
+            created_at, last_id = decode_cursor(cursor, "invoices")
+            try:
+                created_at = datetime.fromisoformat(created_at)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = Invoice.query
+    if start_day:
+        query = query.filter(Invoice.created_at >= datetime.combine(start_day, datetime.min.time()))
+    if end_day:
+        query = query.filter(Invoice.created_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Invoice.username.ilike(pattern), Invoice.invoice_number.ilike(pattern)))
+    if cursor:
+        query = query.filter(or_(
+            Invoice.created_at < created_at,
+            and_(Invoice.created_at == created_at, Invoice.id < last_id)
+        ))
+
+    invoices = query.order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(limit + 1).all()
+    has_more = len(invoices) > limit
+    invoices = invoices[:limit]
+    next_cursor = None
+    if has_more:
+        last = invoices[-1]
+        next_cursor = encode_cursor("invoices", last.created_at.isoformat(), last.id)
+
+    return jsonify({
+        "items": [{
+            "id": inv.id,
+            "invoice_number": inv.invoice_number,
+            "username": inv.username,
+            "total_amount": float(inv.total_amount),
+            "created_at": inv.created_at.isoformat()
+        } for inv in invoices],
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    }), 200
+
+
+@admin_bp.route("/admin/api/invoices/export", methods=["GET"])
+@jwt_required()
+@admin_required
+def export_invoices_file():
+    """Stream every invoice line item in a date range as CSV or NDJSON."""
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format, expected one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start_day = parse_day(request.args["start"]) if request.args.get("start") else None
+        end_day = parse_day(request.args["end"]) if request.args.get("end") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    period = "-".join(d.isoformat() for d in (start_day, end_day) if d) or "all"
+    return Response(
+        stream_with_context(export_invoices(fmt, start_day, end_day, EXPORT_CHUNK_SIZE)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=invoices-{period}.{fmt}"}
+    )
 
 
 @admin_bp.route("/admin/api/invoices/<int:invoice_id>", methods=["GET"])
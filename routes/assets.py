@@ -0,0 +1,35 @@
+# routes/assets.py
+import mimetypes
+import os
+from flask import Blueprint, abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+from assets import MANIFEST
+
+assets_bp = Blueprint("assets", __name__)
+
+ONE_YEAR = 365 * 24 * 3600
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+# Built bundles have their content hash in the name, so they never change and
+# can be cached forever. Takes precedence over the generic /static/ route.
+@assets_bp.route("/static/dist/<path:filename>", methods=["GET"])
+def dist_file(filename):
+    directory = os.path.join(current_app.static_folder, "dist")
+    path = safe_join(directory, filename)
+    if path is None or filename == MANIFEST or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in PRECOMPRESSED:
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=ONE_YEAR)
+
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
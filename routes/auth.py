@@ -1,20 +1,18 @@
 from flask import Blueprint, request, jsonify, make_response, redirect
-from extensions import db, mail
-from models import User, LoginToken, RegisterToken, ResetToken
+from extensions import db
+from mailer import enqueue_email
+from models import User
+from otp import code_store
 from flask_jwt_extended import (
     create_access_token, set_access_cookies, unset_jwt_cookies,
-    jwt_required, get_jwt_identity
+    jwt_required, current_user
 )
-from flask_mail import Message
-from datetime import datetime
-import secrets
 
 auth_bp = Blueprint("auth", __name__)
 
 # ------------------- HELPERS -------------------
 def send_email(subject, recipients, body):
-    msg = Message(subject=subject, recipients=recipients, body=body, sender="no-reply@minimart.kh")
-    mail.send(msg)
+    enqueue_email(subject=subject, recipients=recipients, body=body, sender="no-reply@minimart.kh")
 
 # ------------------- REGISTER -------------------
 @auth_bp.route("/send_register_token", methods=["POST"])
@@ -24,7 +22,7 @@ def send_register_token():
     if not email:
         return jsonify({"error": "Email is required"}), 400
 
-    token = RegisterToken.generate(email)
+    token = code_store().issue("register", email)
     send_email(
         subject="Mini Mart Registration Code",
         recipients=[email],
@@ -44,7 +42,7 @@ def register():
     if not all([username, email, password, token]):
         return jsonify({"error": "All fields are required"}), 400
 
-    if not RegisterToken.verify(email, token):
+    if not code_store().consume("register", email, token):
         return jsonify({"error": "Invalid or expired verification code"}), 400
 
     if User.query.filter_by(username=username).first():
@@ -75,11 +73,16 @@ def login():
     if not user.is_active:
         return jsonify({"error": "Account is disabled"}), 403
 
-    login_token = LoginToken.generate(user)
+    # Upgrade hashes made with older PASSWORD_HASH_METHOD settings
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+
+    token = code_store().issue("login", user.id)
     send_email(
         subject="Your Mini Mart Login Code",
         recipients=[user.email],
-        body=f"Hello {user.username}, your login code is: {login_token.token}\nExpires in 10 minutes."
+        body=f"Hello {user.username}, your login code is: {token}\nExpires in 10 minutes."
     )
 
     return jsonify({"message": "Login code sent to your email"}), 200
@@ -98,13 +101,12 @@ def login_verify():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    login_token = LoginToken.query.filter_by(user_id=user.id, token=token).first()
-    if not login_token or login_token.expires_at < datetime.utcnow():
+    if not code_store().consume("login", user.id, token):
         return jsonify({"error": "Invalid or expired login code"}), 400
 
     access_token = create_access_token(
         identity=str(user.username),  # ✅ Must be string
-        additional_claims={"role": user.role}
+        additional_claims={"role": user.role, "uid": user.id}  # uid lets current_user skip the username lookup
     )
 
     resp = jsonify({
@@ -114,9 +116,6 @@ def login_verify():
         "role": user.role
     })
     set_access_cookies(resp, access_token)
-
-    db.session.delete(login_token)
-    db.session.commit()
     return resp, 200
 
 
@@ -131,10 +130,7 @@ def logout():
 @auth_bp.route("/me", methods=["GET"])
 @jwt_required()
 def me():
-    identity = get_jwt_identity()
-    user = User.query.filter_by(username=identity).first()
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    user = current_user  # cached by identity.load_user
     return jsonify({
         "id": user.id,
         "username": user.username,
@@ -154,7 +150,7 @@ def reset_request():
 
     user = User.query.filter_by(email=email).first()
     if user:
-        token = ResetToken.create_for_user(user)
+        token = code_store().issue("reset", user.id)
         send_email(
             subject="Mini Mart Password Reset",
             recipients=[email],
@@ -178,13 +174,10 @@ def reset_verify():
     if not user:
         return jsonify({"error": "Invalid request"}), 400
 
-    token_hash = ResetToken.hash_token(token)
-    reset_token = ResetToken.query.filter_by(user_id=user.id, token_hash=token_hash).first()
-    if not reset_token or reset_token.used or reset_token.is_expired():
+    if not code_store().consume("reset", user.id, token):
         return jsonify({"error": "Invalid or expired reset code"}), 400
 
     user.set_password(new_password)
-    reset_token.used = True
     db.session.commit()
 
     return jsonify({"message": "Password updated successfully"}), 200
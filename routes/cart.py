@@ -1,23 +1,21 @@
-from flask import Blueprint, request, jsonify, session
-from models import Product
+from flask import Blueprint, jsonify, session
+from pricing import CartError, normalize_cart, price_cart
 
 cart_bp = Blueprint("cart", __name__)
 
 @cart_bp.route("/", methods=["GET"])
 def get_cart():
-    cart_items = session.get("cart", {})
-    products = []
-    for pid, qty in cart_items.items():
-        product = Product.query.get(int(pid))
-        if product:
-            products.append({
-                "id": product.id,
-                "name": product.name,
-                "price": float(product.price),
-                "quantity": qty,
-                "subtotal": float(product.price) * qty
-            })
-    return jsonify(products)
+    try:
+        priced = price_cart(normalize_cart(session.get("cart", {})))
+    except CartError as e:
+        return jsonify(e.to_dict()), e.status
+    return jsonify([{
+        "id": line["id"],
+        "name": line["name"],
+        "price": line["unit_price"],
+        "quantity": line["quantity"],
+        "subtotal": line["subtotal"]
+    } for line in priced.lines])
 
 @cart_bp.route("/add/<int:product_id>", methods=["POST"])
 def add_to_cart(product_id):
@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from models import Category
+from catalog import bump_catalog_version, conditional_catalog
 from flask_jwt_extended import jwt_required, get_jwt
 
 categories_bp = Blueprint("categories", __name__)
 
 # Get all categories
 @categories_bp.route("/", methods=["GET"])
+@conditional_catalog
 def get_categories():
     categories = Category.query.all()
     result = [{"id": c.id, "name": c.name, "description": c.description} for c in categories]
@@ -26,6 +28,7 @@ def add_category():
 
     category = Category(name=data["name"], description=data.get("description", ""))
     db.session.add(category)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"id": category.id, "name": category.name}), 201
 
@@ -41,6 +44,7 @@ def update_category(id):
     data = request.json
     category.name = data.get("name", category.name)
     category.description = data.get("description", category.description)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"id": category.id, "name": category.name})
 
@@ -54,5 +58,6 @@ def delete_category(id):
 
     category = Category.query.get_or_404(id)
     db.session.delete(category)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({"message": "Category deleted"})
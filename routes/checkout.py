@@ -1,10 +1,12 @@
 # routes/checkout.py
 from flask import Blueprint, render_template, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db, mail  # <-- mail is now used
-from models import User, Invoice, InvoiceItem
+from flask_jwt_extended import jwt_required, current_user
+from extensions import db
+from mailer import enqueue_email
+from models import Invoice, InvoiceItem
+from reports import record_sale
+from pricing import CartError, checkout_cart, insert_line_items, normalize_cart
 from datetime import datetime
-from flask_mail import Message
 
 checkout_bp = Blueprint("checkout", __name__, url_prefix="/checkout")
 
@@ -14,14 +16,9 @@ checkout_bp = Blueprint("checkout", __name__, url_prefix="/checkout")
 def checkout_page():
     """
     Render the checkout page.
-    User info is fetched from JWT token.
+    User info comes from the cached JWT identity.
     """
-    identity = get_jwt_identity()
-    user = User.query.filter_by(username=identity).first()
-    if not user:
-        return "User not found", 404
-
-    return render_template("checkout.html", user=user)
+    return render_template("checkout.html", user=current_user)
 
 
 @checkout_bp.route("/create_invoice", methods=["POST"])
@@ -30,12 +27,9 @@ def create_invoice():
     """
     Create an invoice from the current cart.
     Expects cart data from frontend (localStorage sent via fetch).
-    Sends confirmation email using Flask-Mail.
+    Queues a confirmation email for the background mail workers.
     """
-    identity = get_jwt_identity()
-    user = User.query.filter_by(username=identity).first()
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    user = current_user
 
     cart_data = request.get_json()
     if not cart_data or "cart" not in cart_data:
@@ -45,63 +39,59 @@ def create_invoice():
     if not cart:
         return jsonify({"error": "Cart is empty"}), 400
 
-    # Calculate total
-    total_amount = sum(item["price"] * item["quantity"] for item in cart)
-
-    # Generate invoice number
+    # Generate invoice number (its own short transaction, so it must run
+    # before this session takes the stock write lock)
     invoice_number = Invoice.generate_invoice_number()
 
+    # Price the cart server-side (client prices are ignored) and take stock
+    # in the same transaction as the invoice
+    try:
+        priced = checkout_cart(normalize_cart(cart))
+    except CartError as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), e.status
+    total_amount = priced.total
+
     # Create invoice
+    created_at = datetime.utcnow()
     invoice = Invoice(
         username=user.username,
         invoice_number=invoice_number,
         total_amount=total_amount,
-        created_at=datetime.utcnow()
+        created_at=created_at
     )
     db.session.add(invoice)
     db.session.flush()  # Get invoice.id without committing yet
 
-    # Create invoice items
-    for item in cart:
-        invoice_item = InvoiceItem(
-            invoice_id=invoice.id,
-            product_id=item["id"],
-            quantity=item["quantity"],
-            price=item["price"]
-        )
-        db.session.add(invoice_item)
+    # Create invoice items (one executemany INSERT for the whole cart)
+    insert_line_items(InvoiceItem, "invoice_id", invoice.id, priced.lines)
+
+    # Keep the daily sales rollup in the same transaction
+    record_sale(created_at, user.username, total_amount)
 
     # Commit all changes
     try:
         db.session.commit()
     except Exception as e:
         db.session.rollback()
-        print("DB Error:", str(e))
+        current_app.logger.exception("Saving invoice %s failed: %s", invoice_number, e)
         return jsonify({"error": "Failed to save invoice"}), 500
 
-    # Send confirmation email
+    # Queue confirmation email
     try:
-        msg = Message(
-            subject=f"Your Invoice {invoice_number} - Mini Mart",
-            sender=("Mini Mart", current_app.config["MAIL_DEFAULT_SENDER"]),
-            recipients=[user.email],
-            reply_to="no-reply@minimart.com"
-        )
-
         # Email body
         items_html = ""
-        for item in cart:
-            subtotal = item["price"] * item["quantity"]
+        for line in priced.lines:
             items_html += f"""
             <tr>
-                <td style="padding: 8px 0; border-bottom: 1px solid #eee;">{item["name"]}</td>
-                <td style="text-align: center;">{item["quantity"]}</td>
-                <td style="text-align: right;">${item["price"]:.2f}</td>
-                <td style="text-align: right;">${subtotal:.2f}</td>
+                <td style="padding: 8px 0; border-bottom: 1px solid #eee;">{line["name"]}</td>
+                <td style="text-align: center;">{line["quantity"]}</td>
+                <td style="text-align: right;">${line["unit_price"]:.2f}</td>
+                <td style="text-align: right;">${line["subtotal"]:.2f}</td>
             </tr>
             """
 
-        msg.html = f"""
+        html = f"""
         <h2>Thank You for Your Order, {user.username}!</h2>
         <p>Your order has been confirmed. Here are the details:</p>
 
@@ -134,12 +124,19 @@ def create_invoice():
         <small style="color: #777;">This is an automated email. Please do not reply.</small>
         """
 
-        mail.send(msg)
-        print(f"Invoice email sent to {user.email}")
+        enqueue_email(
+            subject=f"Your Invoice {invoice_number} - Mini Mart",
+            sender=("Mini Mart", current_app.config["MAIL_DEFAULT_SENDER"]),
+            recipients=[user.email],
+            reply_to="no-reply@minimart.com",
+            html=html
+        )
+        current_app.logger.info("Invoice email queued for %s", user.email)
 
     except Exception as e:
         # Log error but don't fail checkout
-        print(f"Failed to send email to {user.email}: {str(e)}")
+        db.session.rollback()
+        current_app.logger.exception("Failed to queue invoice email to %s: %s", user.email, e)
         # Optional: save email failure in logs table later
 
     return jsonify({
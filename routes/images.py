@@ -0,0 +1,48 @@
+# routes/images.py
+import os
+from flask import Blueprint, abort, current_app, request, send_file
+from werkzeug.security import safe_join
+from images import InvalidImage, is_content_name, resize_cache
+
+images_bp = Blueprint("images", __name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp"}
+ONE_YEAR = 365 * 24 * 3600
+
+
+# Resized copy of any image in the upload folder, e.g. /img/264x264/guitar.png.
+# The image is fitted inside the box without upscaling, as WebP when the
+# browser accepts it and JPEG otherwise. Content-hashed uploads never change
+# and are cached for good; legacy names can be replaced in place, so browsers
+# must revalidate them (the ETag changes with the source file).
+@images_bp.route("/img/<int:width>x<int:height>/<path:filename>", methods=["GET"])
+def resized_image(width, height, filename):
+    max_side = current_app.config["IMAGE_RESIZE_MAX_SIDE"]
+    if not (0 < width <= max_side and 0 < height <= max_side):
+        abort(404)
+    if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+        abort(404)
+    source = safe_join(current_app.config["UPLOAD_FOLDER"], filename)
+    if source is None or not os.path.isfile(source):
+        abort(404)
+
+    ext = "webp" if request.accept_mimetypes["image/webp"] else "jpg"
+    try:
+        path = resize_cache.get(source, width, height, ext, current_app.config["IMAGE_QUALITY"])
+    except InvalidImage as e:
+        current_app.logger.warning("Cannot resize %s", e)
+        abort(404)
+
+    # The render's own mtime is bumped on every hit for LRU eviction, so the
+    # validators come from its name (which hashes the source's size and mtime)
+    immutable = is_content_name(os.path.basename(filename))
+    response = send_file(path, mimetype=f"image/{'jpeg' if ext == 'jpg' else ext}",
+                         etag=os.path.basename(path), last_modified=os.path.getmtime(source),
+                         max_age=ONE_YEAR if immutable else None)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add("Accept")
+    return response
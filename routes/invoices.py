@@ -1,32 +1,32 @@
-from flask import Blueprint, request, jsonify, session
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, jsonify, session
+from flask_jwt_extended import jwt_required, current_user
 from extensions import db
-from models import Order, OrderItem, Product
+from models import Order, OrderItem
+from pricing import CartError, checkout_cart, insert_line_items, normalize_cart
 
 invoices_bp = Blueprint("invoices", __name__)
 
 @invoices_bp.route("/checkout", methods=["POST"])
 @jwt_required()
 def checkout():
-    user_id = get_jwt_identity()
+    user_id = current_user.id
     cart_items = session.get("cart", {})
     if not cart_items:
         return jsonify({"error": "Cart empty"}), 400
 
-    order = Order(user_id=user_id)
+    # One IN query to price the cart, one conditional UPDATE to take stock
+    try:
+        priced = checkout_cart(normalize_cart(cart_items))
+    except CartError as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), e.status
+
+    order = Order(user_id=user_id, total_price=priced.total)
     db.session.add(order)
-    db.session.commit()
+    db.session.flush()
 
-    total_price = 0
-    for pid, qty in cart_items.items():
-        product = Product.query.get(int(pid))
-        if product:
-            item_price = float(product.price)
-            total_price += item_price * qty
-            order_item = OrderItem(order_id=order.id, product_id=product.id, quantity=qty, price=item_price)
-            db.session.add(order_item)
+    insert_line_items(OrderItem, "order_id", order.id, priced.lines)
 
-    order.total_price = total_price
     db.session.commit()
     session.pop("cart", None)
-    return jsonify({"message": "Order placed", "order_id": order.id, "total": total_price})
+    return jsonify({"message": "Order placed", "order_id": order.id, "total": priced.total})
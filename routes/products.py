@@ -1,47 +1,246 @@
 # routes/products.py
-from flask import Blueprint, jsonify, current_app
-from models import Product, db
-from werkzeug.utils import secure_filename
-import os
+from flask import Blueprint, jsonify, request
+from models import Product, Category, db
+from pagination import encode_cursor, decode_cursor, parse_limit
+from serializers import CATALOG_FIELDS, PRODUCT_FIELDS, product_query, serialize_product, serialize_product_row
+from search import build_match_expression, ranked_matches
+from catalog import conditional_catalog, conditional_stock
+from images import save_upload
+from pricing import MAX_CART_LINES
+from sqlalchemy import or_, tuple_
 
 products_bp = Blueprint("products", __name__, url_prefix="/api")
 
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+MAX_SEARCH_RESULTS = 100
+MAX_LOOKUP_IDS = MAX_CART_LINES  # a whole cart revalidates in one request
+
+# What a cart needs to refresh its lines; no category, so no join
+LOOKUP_FIELDS = ("id", "name", "price", "stock", "image", "images")
+
+# sort name -> (column, direction); ties are always broken by Product.id
+PRODUCT_SORTS = {
+    "newest": (Product.id, "desc"),
+    "oldest": (Product.id, "asc"),
+    "price_asc": (Product.price, "asc"),
+    "price_desc": (Product.price, "desc"),
+    "name_asc": (Product.name, "asc"),
+    "name_desc": (Product.name, "desc"),
+}
+
+
 # Helper to save uploaded image
 def save_image(image_file):
-    if not image_file or not image_file.filename:
-        return None
-    filename = secure_filename(image_file.filename)
-    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    image_file.save(filepath)
-    return filename
-
-# 1️⃣ GET all products (public)
+    return save_upload(image_file)
+
+
+# -------------------
+# QUERY HELPERS
+# -------------------
+def _arg_list(name):
+    """Accept both ?x=1&x=2 and ?x=1,2."""
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(v.strip() for v in raw.split(",") if v.strip())
+    return values
+
+
+def parse_fields():
+    requested = _arg_list("fields")
+    if not requested:
+        return list(CATALOG_FIELDS)
+    unknown = [f for f in requested if f not in CATALOG_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def parse_ids(values):
+    """Product ids from ?ids= or a JSON body, de-duplicated in request order."""
+    try:
+        ids = [int(v) for v in values]
+    except (TypeError, ValueError):
+        raise ValueError("ids must be integers")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("ids is required")
+    if len(ids) > MAX_LOOKUP_IDS:
+        raise ValueError(f"At most {MAX_LOOKUP_IDS} ids per request")
+    return ids
+
+
+def lookup_products(ids):
+    """Current price/stock for `ids` with one primary-key IN query, in request order."""
+    columns = [PRODUCT_FIELDS[f].label(f) for f in LOOKUP_FIELDS]
+    rows = db.session.query(*columns).filter(Product.id.in_(ids)).all()
+    found = {row.id: serialize_product_row(row, LOOKUP_FIELDS) for row in rows}
+    items = []
+    for pid in ids:
+        if pid in found:
+            item = found[pid]
+            item["available"] = item["stock"] > 0
+            items.append(item)
+    return {"items": items, "missing": [pid for pid in ids if pid not in found]}
+
+
+def apply_product_filters(query, include_search=True):
+    """Translate the public catalog filters into SQL WHERE clauses."""
+    category_ids = _arg_list("category_id")
+    category_names = _arg_list("category")
+    min_price = request.args.get("min_price")
+    max_price = request.args.get("max_price")
+    search = (request.args.get("q") or "").strip()
+
+    if category_ids:
+        try:
+            query = query.filter(Product.category_id.in_([int(c) for c in category_ids]))
+        except ValueError:
+            raise ValueError("Invalid category_id")
+    if category_names:
+        query = query.filter(Category.name.in_(category_names))
+    try:
+        if min_price not in (None, ""):
+            query = query.filter(Product.price >= float(min_price))
+        if max_price not in (None, ""):
+            query = query.filter(Product.price <= float(max_price))
+    except ValueError:
+        raise ValueError("Invalid min_price or max_price")
+    if search and include_search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Product.name.ilike(pattern), Category.name.ilike(pattern)))
+    return query
+
+
+def apply_keyset(query, sort, cursor):
+    """Order by the sort column (then id) and seek past the cursor row."""
+    column, direction = PRODUCT_SORTS[sort]
+    if column is Product.id:
+        order_by = [column.desc() if direction == "desc" else column.asc()]
+    else:
+        order_by = [column.desc(), Product.id.desc()] if direction == "desc" \
+            else [column.asc(), Product.id.asc()]
+    query = query.order_by(*order_by)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if column is Product.id:
+            query = query.filter(Product.id < last_id if direction == "desc" else Product.id > last_id)
+        else:
+            if not isinstance(value, str if column is Product.name else (int, float)) or isinstance(value, bool):
+                raise ValueError("Invalid cursor")
+            # A row-value comparison seeks the (column, id) index directly
+            key = tuple_(column, Product.id)
+            query = query.filter(key < (value, last_id) if direction == "desc" else key > (value, last_id))
+    return query
+
+
+# 1️⃣ GET products (public) — keyset paginated, filtered and sorted in SQL
 @products_bp.route("/products", methods=["GET"], strict_slashes=False)
 def get_all_products():
-    products = Product.query.order_by(Product.id.desc()).all()
-    return jsonify([
-        {
-            "id": p.id,
-            "name": p.name,
-            "price": float(p.price),
-            "stock": p.stock,
-            "category_id": p.category_id,
-            "category_name": p.category.name if p.category else None,
-            "image": p.image
-        } for p in products
-    ]), 200
-
-# 2️⃣ GET single product (public)
-@products_bp.route("/products/<int:product_id>", methods=["GET"], strict_slashes=False)
-def get_product(product_id):
-    p = Product.query.get_or_404(product_id)
+    if "ids" in request.args:
+        return get_products_by_id()
+    return list_products()
+
+
+@conditional_stock
+def get_products_by_id():
+    try:
+        return jsonify(lookup_products(parse_ids(_arg_list("ids")))), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@conditional_catalog
+def list_products():
+    sort = request.args.get("sort", "newest")
+    if sort not in PRODUCT_SORTS:
+        return jsonify({"error": f"Invalid sort, expected one of: {', '.join(PRODUCT_SORTS)}"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        fields = parse_fields()
+        sort_column = PRODUCT_SORTS[sort][0]
+        # id and the sort column are always selected so the cursor can be built
+        columns = [PRODUCT_FIELDS[f].label(f) for f in fields]
+        columns += [Product.id.label("_id"), sort_column.label("_sort")]
+
+        query = db.session.query(*columns).select_from(Product) \
+            .outerjoin(Category, Product.category_id == Category.id)
+        query = apply_product_filters(query)
+        query = apply_keyset(query, sort, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [serialize_product_row(row, fields) for row in rows]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last._sort, last._id)
+
     return jsonify({
-        "id": p.id,
-        "name": p.name,
-        "price": float(p.price),
-        "stock": p.stock,
-        "category_id": p.category_id,
-        "category_name": p.category.name if p.category else None,
-        "image": p.image
+        "items": items,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "limit": limit,
+        "sort": sort
     }), 200
+
+# 1️⃣b Batch lookup by id (public) — POST form of /products?ids= for long carts
+@products_bp.route("/products/lookup", methods=["POST"], strict_slashes=False)
+def lookup_products_batch():
+    payload = request.get_json(silent=True)
+    values = payload.get("ids") if isinstance(payload, dict) else payload
+    if not isinstance(values, list):
+        return jsonify({"error": 'Expected {"ids": [...]}'}), 400
+    try:
+        return jsonify(lookup_products(parse_ids(values))), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+# 2️⃣ Full-text search (public) — FTS5 ranked, prefix and typo tolerant
+@products_bp.route("/products/search", methods=["GET"], strict_slashes=False)
+@conditional_catalog
+def search_products():
+    match = build_match_expression(request.args.get("q", ""))
+    if not match:
+        return jsonify({"error": "Search query is required"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"), DEFAULT_PAGE_SIZE, MAX_SEARCH_RESULTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        fields = parse_fields()
+        columns = [PRODUCT_FIELDS[f].label(f) for f in fields]
+        ranked = ranked_matches(match)
+        query = db.session.query(*columns).select_from(ranked) \
+            .join(Product, Product.id == ranked.c.rowid) \
+            .outerjoin(Category, Product.category_id == Category.id)
+        query = apply_product_filters(query, include_search=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = query.order_by(ranked.c.score, Product.id.desc()).limit(limit).all()
+    return jsonify({
+        "items": [serialize_product_row(row, fields) for row in rows],
+        "query": match
+    }), 200
+
+# 3️⃣ GET single product (public)
+@products_bp.route("/products/<int:product_id>", methods=["GET"], strict_slashes=False)
+@conditional_catalog
+def get_product(product_id):
+    p = product_query().filter(Product.id == product_id).first_or_404()
+    item = serialize_product(p)
+    return jsonify({f: item[f] for f in CATALOG_FIELDS}), 200
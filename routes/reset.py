@@ -1,5 +1,6 @@
 from flask import request, jsonify, Blueprint
-from models import User, ResetToken
+from models import User
+from otp import code_store
 from extensions import db
 from utils import send_email
 
@@ -19,12 +20,7 @@ def request_reset():
         return jsonify({"error": "No user found with this email"}), 404
 
     # Generate 6-digit token
-    token = ResetToken.generate_token()
-    token_hash = ResetToken.hash_token(token)
-
-    reset_entry = ResetToken(user_id=user.id, token_hash=token_hash)
-    db.session.add(reset_entry)
-    db.session.commit()
+    token = code_store().issue("reset", user.id)
 
     # Send email
     subject = "Your Mini Mart Password Reset Token"
@@ -48,17 +44,8 @@ def verify_token():
     if not user:
         return jsonify({"error": "No user found with this email"}), 404
 
-    reset_entry = ResetToken.query.filter_by(user_id=user.id, used=False)\
-        .order_by(ResetToken.created_at.desc()).first()
-
-    if not reset_entry:
-        return jsonify({"error": "No valid reset token found"}), 400
-
-    if reset_entry.is_expired():
-        return jsonify({"error": "Token has expired"}), 400
-
-    if reset_entry.token_hash != ResetToken.hash_token(token):
-        return jsonify({"error": "Invalid token"}), 400
+    if not code_store().peek("reset", user.id, token):
+        return jsonify({"error": "Invalid or expired token"}), 400
 
     return jsonify({"message": "Token is valid"}), 200
 
@@ -78,21 +65,11 @@ def reset_password():
     if not user:
         return jsonify({"error": "No user found with this email"}), 404
 
-    reset_entry = ResetToken.query.filter_by(user_id=user.id, used=False)\
-        .order_by(ResetToken.created_at.desc()).first()
-
-    if not reset_entry:
-        return jsonify({"error": "No valid reset token found"}), 400
-
-    if reset_entry.is_expired():
-        return jsonify({"error": "Token has expired"}), 400
-
-    if reset_entry.token_hash != ResetToken.hash_token(token):
-        return jsonify({"error": "Invalid token"}), 400
+    if not code_store().consume("reset", user.id, token):
+        return jsonify({"error": "Invalid or expired token"}), 400
 
     # Reset password
     user.set_password(new_password)
-    reset_entry.used = True
     db.session.commit()
 
     return jsonify({"message": "Password has been reset successfully!"}), 200
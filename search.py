@@ -0,0 +1,238 @@
+# search.py
+import re
+import time
+from sqlalchemy import column, create_engine, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from extensions import db
+
+# FTS5 index over Product.name, Category.name and Category.description.
+# Rows are keyed by product id and kept in sync by the triggers below, so every
+# product/category write (admin API or otherwise) updates the index in the same
+# transaction. Prefix indexes cover whole words up to 8 letters, so "guitar"*
+# reads one precomputed doclist instead of merging every term it expands to.
+SEARCH_TABLE = "product_search"
+VOCAB_TABLE = "product_search_vocab"
+
+SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, category_name, category_description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6 7 8'
+    )""",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab({SEARCH_TABLE}, 'row')",
+    f"""CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category_name, category_description)
+        SELECT new.id, new.name, c.name, c.description
+        FROM (SELECT 1) LEFT JOIN category c ON c.id = new.category_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name, category_id ON product BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category_name, category_description)
+        SELECT new.id, new.name, c.name, c.description
+        FROM (SELECT 1) LEFT JOIN category c ON c.id = new.category_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS category_search_au AFTER UPDATE OF name, description ON category BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM product WHERE category_id = new.id);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category_name, category_description)
+        SELECT id, name, new.name, new.description FROM product WHERE category_id = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS category_search_ad AFTER DELETE ON category BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM product WHERE category_id = old.id);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category_name, category_description)
+        SELECT id, name, NULL, NULL FROM product WHERE category_id = old.id;
+    END""",
+]
+
+# bm25 column weights: product name >> category name > category description.
+# Category words match every product in the category, so they barely count.
+RANK_EXPR = f"bm25({SEARCH_TABLE}, 10.0, 1.0, 0.5)"
+
+# Only this many matches (newest products first) are ranked per search, so a
+# word shared by most of the catalog costs the same as a rare one
+SEARCH_CANDIDATES = 1000
+
+MIN_FUZZY_LENGTH = 4
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep Alembic autogenerate from dropping the FTS5 table and its shadow tables."""
+    if type_ == "table" and reflected and compare_to is None and name.startswith(SEARCH_TABLE):
+        return False
+    return True
+
+
+def create_search_index():
+    """Create the FTS5 table and sync triggers if they are missing."""
+    for ddl in SEARCH_DDL:
+        db.session.execute(text(ddl))
+    db.session.commit()
+
+
+def rebuild_search_index():
+    """Repopulate the index from product/category; returns the row count."""
+    create_search_index()
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    db.session.execute(text(f"""
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category_name, category_description)
+        SELECT p.id, p.name, c.name, c.description
+        FROM product p LEFT JOIN category c ON c.id = p.category_id
+    """))
+    db.session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+
+# -------------------
+# QUERY BUILDING
+# -------------------
+def _within_distance(a, b, max_distance):
+    """Levenshtein distance check that gives up once max_distance is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+
+def _prefix_upper_bound(term):
+    return term[:-1] + chr(ord(term[-1]) + 1)
+
+
+def _has_prefix_match(term, session):
+    row = session.execute(
+        text(f"SELECT 1 FROM {VOCAB_TABLE} WHERE term >= :lo AND term < :hi LIMIT 1"),
+        {"lo": term, "hi": _prefix_upper_bound(term)}
+    ).first()
+    return row is not None
+
+
+def _fuzzy_candidates(term, session, limit=5):
+    """Indexed terms within edit distance 1 (2 for long words) sharing the first letter."""
+    max_distance = 2 if len(term) >= 8 else 1
+    rows = session.execute(
+        text(f"""SELECT term FROM {VOCAB_TABLE}
+                 WHERE term >= :lo AND term < :hi
+                   AND length(term) BETWEEN :min_len AND :max_len
+                 ORDER BY doc DESC"""),
+        {
+            "lo": term[0], "hi": _prefix_upper_bound(term[0]),
+            "min_len": len(term) - max_distance, "max_len": len(term) + max_distance
+        }
+    )
+    matches = [r.term for r in rows if _within_distance(term, r.term, max_distance)]
+    return matches[:limit]
+
+
+def build_match_expression(query, session=None):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match,
+    either as a prefix or, when nothing starts with it, as a close misspelling.
+    Returns None when the query has no searchable words.
+    """
+    session = session or db.session
+    terms = [t.lower() for t in TERM_RE.findall(query or "")]
+    if not terms:
+        return None
+
+    groups = []
+    for term in terms:
+        options = [f'"{term}"*']
+        if len(term) >= MIN_FUZZY_LENGTH and not _has_prefix_match(term, session):
+            options += [f'"{c}"' for c in _fuzzy_candidates(term, session)]
+        groups.append(options[0] if len(options) == 1 else "(" + " OR ".join(options) + ")")
+    return " AND ".join(groups)
+
+
+def ranked_matches(match, candidates=SEARCH_CANDIDATES):
+    """
+    Subquery of (rowid, score) for the newest `candidates` rows matching `match`.
+    FTS5 walks the match in rowid order and stops at the limit, so bm25 is only
+    computed for those rows; order the outer query by score (lower is better).
+    """
+    search = table(SEARCH_TABLE, column("rowid"))
+    return select(search.c.rowid, literal_column(RANK_EXPR).label("score")) \
+        .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=match)) \
+        .order_by(search.c.rowid.desc()).limit(candidates).subquery()
+
+
+# -------------------
+# BENCHMARK
+# -------------------
+BENCH_QUERIES = ("guitar", "guitr", "fender strat", "bass", "acoustic guitar", "tube amp", "xylophone")
+BENCH_CATEGORIES = {
+    "Electric Guitars": "Solid and hollow body electric guitars",
+    "Acoustic Guitars": "Steel string and classical acoustic guitars",
+    "Bass Guitars": "Four and five string bass guitars",
+    "Amplifiers": "Tube and solid state guitar amplifiers",
+    "Pedals": "Effects pedals for guitar and bass",
+}
+BENCH_WORDS = ("Fender", "Gibson", "Ibanez", "Yamaha", "Martin", "Strat", "Tele", "Paul", "Jazz",
+               "Precision", "Vintage", "Custom", "Deluxe", "Standard", "Tube", "Combo", "Overdrive",
+               "Delay", "Sunburst", "Maple", "Rosewood", "Mahogany", "Dreadnought", "Studio")
+
+
+def benchmark_search(products=100_000, queries=BENCH_QUERIES, rounds=20, limit=24):
+    """
+    Build a scratch SQLite catalog of `products` products with the FTS5 index,
+    then time parsing plus the ranked query for each of `queries`, ranking
+    either every match or only SEARCH_CANDIDATES of them.
+    Returns {query: {"all": (median ms, max ms), "capped": (median ms, max ms), "matches": n}}.
+    """
+    import os
+    import random
+    import statistics
+    import tempfile
+    from models import Category, Product
+
+    rng = random.Random(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'search.db')}")
+        db.metadata.create_all(engine, tables=[Category.__table__, Product.__table__])
+        with Session(engine) as session, session.begin():
+            for ddl in SEARCH_DDL:
+                session.execute(text(ddl))
+            session.execute(Category.__table__.insert(), [
+                {"name": name, "description": description} for name, description in BENCH_CATEGORIES.items()
+            ])
+            category_ids = list(range(1, len(BENCH_CATEGORIES) + 1))
+            session.execute(Product.__table__.insert(), [{
+                "name": " ".join(rng.sample(BENCH_WORDS, 3)) + f" {n}",
+                "price": float(rng.randint(50, 3000)),
+                "stock": rng.randint(0, 20),
+                "category_id": rng.choice(category_ids),
+            } for n in range(products)])
+            session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+
+        with Session(engine) as session:
+            for q in queries:
+                results[q] = {}
+                for label, candidates in (("all", None), ("capped", SEARCH_CANDIDATES)):
+                    timings = []
+                    for _ in range(rounds):
+                        started = time.perf_counter()
+                        match = build_match_expression(q, session)
+                        ranked = ranked_matches(match, candidates)
+                        session.execute(
+                            select(Product.id, Product.name).select_from(ranked)
+                            .join(Product, Product.id == ranked.c.rowid)
+                            .order_by(ranked.c.score).limit(limit)
+                        ).all()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    results[q][label] = (statistics.median(timings), max(timings))
+                results[q]["matches"] = session.execute(
+                    text(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"),
+                    {"match": build_match_expression(q, session)}
+                ).scalar()
+        engine.dispose()
+    return results
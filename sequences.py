@@ -0,0 +1,119 @@
+# sequences.py
+import os
+import threading
+from sqlalchemy import Integer, cast, create_engine, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import Invoice, Sequence
+
+# Invoice numbers come from a row in the `sequence` table instead of
+# MAX(invoice.id) + 1. Each process reserves a block of numbers with a single
+# atomic UPDATE on its own short transaction, then hands them out from memory,
+# so concurrent checkouts never collide and only touch the row once per block.
+# Numbers left in a block when a process exits are skipped (gaps, no duplicates).
+
+
+class SequenceAllocator:
+    def __init__(self, name, block_size=20, engine=None, seed=None):
+        self.name = name
+        self.block_size = block_size
+        self.seed = seed or (lambda conn: 1)
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = os.getpid()
+
+    @property
+    def engine(self):
+        return self._engine if self._engine is not None else db.engine
+
+    def next(self):
+        with self._lock:
+            if self._pid != os.getpid():  # forked: never reuse the parent's block
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._next >= self._end:
+                self._next, self._end = self._reserve()
+            value = self._next
+            self._next += 1
+            return value
+
+    def _reserve(self):
+        """Atomically move the counter forward by one block; returns [start, end)."""
+        bump = update(Sequence).where(Sequence.name == self.name) \
+            .values(next_value=Sequence.next_value + self.block_size)
+        with self.engine.begin() as conn:
+            # The UPDATE takes the write lock first, so the SELECT below sees
+            # only our own increment.
+            if conn.execute(bump).rowcount == 0:
+                self._create(conn)
+                conn.execute(bump)
+            end = conn.execute(select(Sequence.next_value).where(Sequence.name == self.name)).scalar_one()
+        return end - self.block_size, end
+
+    def _create(self, conn):
+        dialect_insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+        conn.execute(
+            dialect_insert(Sequence).values(name=self.name, next_value=self.seed(conn))
+            .on_conflict_do_nothing()
+        )
+
+
+def _seed_from_invoices(conn):
+    """First invoice number after the ones already issued (INV000123 -> 124)."""
+    last = conn.execute(
+        select(func.max(cast(func.substr(Invoice.invoice_number, 4), Integer)))
+    ).scalar()
+    return (last or 0) + 1
+
+
+invoice_numbers = SequenceAllocator("invoice", seed=_seed_from_invoices)
+
+
+def configure_sequences(app):
+    invoice_numbers.block_size = app.config["INVOICE_NUMBER_BLOCK_SIZE"]
+
+
+# -------------------
+# STRESS TEST
+# -------------------
+def _stress_worker(url, count, block_size):
+    """Child process: allocate `count` numbers and insert one invoice row per number."""
+    engine = create_engine(url, connect_args={"timeout": 30})
+    allocator = SequenceAllocator("invoice", block_size=block_size, engine=engine,
+                                  seed=_seed_from_invoices)
+    issued = []
+    for _ in range(count):
+        number = f"INV{allocator.next():06d}"
+        with engine.begin() as conn:
+            conn.execute(insert(Invoice).values(
+                username=f"stress-{os.getpid()}", invoice_number=number, total_amount=0
+            ))
+        issued.append(number)
+    engine.dispose()
+    return issued
+
+
+def stress_invoice_numbers(url, processes, per_process, block_size):
+    """
+    Run `processes` workers against the database at `url`, each allocating
+    `per_process` invoice numbers and inserting an invoice for every one.
+    Returns (issued, duplicates, rows_in_db).
+    """
+    import multiprocessing
+
+    engine = create_engine(url)
+    db.metadata.create_all(engine, tables=[Sequence.__table__, Invoice.__table__])
+    engine.dispose()
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes) as pool:
+        results = pool.starmap(_stress_worker, [(url, per_process, block_size)] * processes)
+
+    issued = [n for chunk in results for n in chunk]
+    duplicates = len(issued) - len(set(issued))
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        rows = conn.execute(select(func.count()).select_from(Invoice)).scalar()
+    engine.dispose()
+    return issued, duplicates, rows
@@ -0,0 +1,54 @@
+# serializers.py
+from sqlalchemy.orm import joinedload
+from models import Product, Category
+from images import variant_urls
+
+
+# Columns exposed by the product listing endpoints, keyed by JSON field name.
+# Category.name is reached through an outer join, never through the lazy
+# Product.category backref.
+PRODUCT_FIELDS = {
+    "id": Product.id,
+    "sku": Product.sku,
+    "name": Product.name,
+    "price": Product.price,
+    "stock": Product.stock,
+    "category_id": Product.category_id,
+    "category_name": Category.name,
+    "image": Product.image,
+    "images": Product.image_variants,
+}
+
+# Public catalog pages are cached until the next product/category write, and
+# stock moves on every checkout, so they leave it out
+CATALOG_FIELDS = tuple(f for f in PRODUCT_FIELDS if f != "stock")
+
+
+def product_query():
+    """Product query that loads each row's category in the same SELECT."""
+    return Product.query.options(joinedload(Product.category))
+
+
+def serialize_product(p):
+    """Serialize a Product loaded through product_query()."""
+    return {
+        "id": p.id,
+        "sku": p.sku,
+        "name": p.name,
+        "price": float(p.price),
+        "stock": p.stock,
+        "category_id": p.category_id,
+        "category_name": p.category.name if p.category else None,
+        "image": p.image,
+        "images": variant_urls(p.image_variants)
+    }
+
+
+def serialize_product_row(row, fields):
+    """Serialize a labelled column projection built from PRODUCT_FIELDS."""
+    item = {f: getattr(row, f) for f in fields}
+    if item.get("price") is not None:
+        item["price"] = float(item["price"])
+    if "images" in item:
+        item["images"] = variant_urls(item["images"])
+    return item
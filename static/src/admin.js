@@ -0,0 +1,76 @@
+window.addEventListener("DOMContentLoaded", () => {
+  // Mobile menu toggle
+  const sidebar = document.getElementById("sidebar");
+  const menuToggle = document.getElementById("menuToggle");
+  menuToggle.addEventListener("click", () => sidebar.classList.toggle("open"));
+
+  document.querySelector(".content").addEventListener("click", () => {
+    if (window.innerWidth <= 768 && sidebar.classList.contains("open")) {
+      sidebar.classList.remove("open");
+    }
+  });
+
+  // Highlight active sidebar item
+  document.querySelectorAll(".sidebar__link").forEach(link => {
+    if (link.href === window.location.href) link.classList.add("active");
+  });
+
+  // ============================
+  // USERNAME + LOGOUT WITH MODAL
+  // ============================
+  const usernameSpan = document.getElementById('username');
+  const logoutBtn = document.getElementById('logoutBtn');
+  const modal = document.getElementById('logoutModal');
+  const cancelBtn = document.getElementById('cancelLogout');
+  const confirmBtn = document.getElementById('confirmLogout');
+
+  const token = localStorage.getItem('token');
+
+  // Show username from JWT
+  if (token) {
+    try {
+      const payload = JSON.parse(atob(token.split('.')[1]));
+      const username = payload.identity || payload.sub || 'Admin';
+      usernameSpan.textContent = username;
+    } catch (e) {
+      usernameSpan.textContent = 'Admin';
+    }
+  }
+
+  // Open modal
+  logoutBtn.addEventListener("click", (e) => {
+    e.preventDefault();
+    modal.classList.add('show');
+  });
+
+  // Close modal
+  cancelBtn.addEventListener("click", () => {
+    modal.classList.remove('show');
+  });
+
+  // Close on outside click
+  modal.addEventListener("click", (e) => {
+    if (e.target === modal) {
+      modal.classList.remove('show');
+    }
+  });
+
+  // Confirm logout
+  confirmBtn.addEventListener("click", async () => {
+    try {
+      await fetch("/auth/logout", {
+        method: "POST",
+        headers: { "Authorization": `Bearer ${token}` }
+      });
+    } catch (err) {
+      // ignore
+    }
+
+    localStorage.removeItem("token");
+    localStorage.removeItem("username");
+    localStorage.removeItem("role");
+
+    window.location.href = "/";
+  });
+
+});
@@ -0,0 +1,149 @@
+document.addEventListener("DOMContentLoaded", () => {
+  const authContainer = document.getElementById("authContainer");
+  const menuToggle = document.getElementById("menuToggle");
+  const mobileMenu = document.getElementById("mobileMenu");
+
+  // Mobile menu
+  menuToggle.addEventListener("click", () => mobileMenu.classList.toggle("open"));
+  document.querySelector(".content").addEventListener("click", () => {
+    if (mobileMenu.classList.contains("open")) mobileMenu.classList.remove("open");
+  });
+
+  // === AUTH: Replace Login with Profile Button ===
+  const token = localStorage.getItem("jwtToken") || localStorage.getItem("token");
+
+  if (token) {
+    let username = "User";
+    try {
+      const payload = JSON.parse(atob(token.split('.')[1]));
+      username = payload.identity || payload.sub || "User";
+    } catch (e) {}
+
+    authContainer.innerHTML = `
+      <div class="profile-dropdown">
+        <button class="profile-btn" id="profileBtn">
+          ${username} <span class="caret">▼</span>
+        </button>
+        <div id="profileDropdown">
+          <a href="/reset-password">Reset Password</a>
+          <a href="#" id="logoutTrigger">Logout</a>
+        </div>
+      </div>
+    `;
+
+    const profileBtn = document.getElementById("profileBtn");
+    const dropdown = document.getElementById("profileDropdown");
+
+    profileBtn.addEventListener("click", (e) => {
+      e.stopPropagation();
+      profileBtn.classList.toggle("open");
+      dropdown.classList.toggle("show");
+    });
+
+    document.addEventListener("click", () => {
+      profileBtn.classList.remove("open");
+      dropdown.classList.remove("show");
+    });
+  }
+
+  // === LOGOUT MODAL ===
+  const modal = document.getElementById("logoutModal");
+  const cancelBtn = document.getElementById("cancelLogout");
+  const confirmBtn = document.getElementById("confirmLogout");
+
+  document.body.addEventListener("click", (e) => {
+    if (e.target.id === "logoutTrigger") {
+      e.preventDefault();
+      modal.classList.add("show");
+    }
+  });
+
+  cancelBtn.addEventListener("click", () => modal.classList.remove("show"));
+  modal.addEventListener("click", (e) => {
+    if (e.target === modal) modal.classList.remove("show");
+  });
+
+  confirmBtn.addEventListener("click", async () => {
+    try {
+      await fetch("/auth/logout", {
+        method: "POST",
+        headers: { "Authorization": `Bearer ${token}` }
+      });
+    } catch (e) {}
+    localStorage.clear();
+    window.location.href = "/";
+  });
+});
+
+document.getElementById("year").textContent = new Date().getFullYear();
+
+/* ---------- GLOBAL CART BADGE ---------- */
+function updateCartCount() {
+  const cart = JSON.parse(localStorage.getItem('cart') || '[]');
+  const totalItems = cart.reduce((sum, item) => sum + item.quantity, 0);
+  document.querySelectorAll('.cart-link').forEach(link => {
+    let countSpan = link.querySelector('.cart-count');
+    if (!countSpan) {
+      countSpan = document.createElement('sup');
+      countSpan.className = 'cart-count';
+      Object.assign(countSpan.style, {
+        marginLeft: '4px',
+        background: 'var(--color-primary)',
+        color: 'white',
+        borderRadius: '50%',
+        fontSize: '0.7rem',
+        padding: '2px 6px',
+        minWidth: '18px',
+        textAlign: 'center'
+      });
+      link.appendChild(countSpan);
+    }
+    countSpan.textContent = totalItems > 0 ? totalItems : '';
+    countSpan.style.display = totalItems > 0 ? 'inline' : 'none';
+  });
+}
+
+// Expose globally
+window.updateCartCount = updateCartCount;
+
+/* ---------- CART REVALIDATION ---------- */
+// Refresh the saved cart's names, prices and stock in one request. Drops
+// products that are gone or sold out and caps quantities at current stock.
+// Resolves to { cart, changes } where changes are messages for the shopper.
+async function revalidateCart() {
+  const cart = JSON.parse(localStorage.getItem('cart') || '[]');
+  if (!cart.length) return { cart, changes: [] };
+
+  const ids = [...new Set(cart.map(item => item.id))];
+  let current;
+  try {
+    const res = await fetch(`/api/products?ids=${ids.join(',')}`);
+    if (!res.ok) return { cart, changes: [] };
+    current = new Map((await res.json()).items.map(p => [p.id, p]));
+  } catch (e) {
+    return { cart, changes: [] };  // offline: keep what we have
+  }
+
+  const changes = [];
+  const fresh = [];
+  cart.forEach(item => {
+    const p = current.get(item.id);
+    if (!p || !p.available) {
+      changes.push(`${item.name} is no longer available`);
+      return;
+    }
+    if (p.price !== item.price) changes.push(`${p.name} is now $${p.price.toFixed(2)}`);
+    const quantity = Math.min(item.quantity, p.stock);
+    if (quantity < item.quantity) changes.push(`Only ${p.stock} of ${p.name} left`);
+    fresh.push({ ...item, name: p.name, price: p.price, image: p.image, quantity });
+  });
+
+  localStorage.setItem('cart', JSON.stringify(fresh));
+  updateCartCount();
+  return { cart: fresh, changes };
+}
+
+window.revalidateCart = revalidateCart;
+
+// Run on every page
+document.addEventListener('DOMContentLoaded', updateCartCount);
@@ -0,0 +1,114 @@
+# tokens.py
+import random
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import delete, select
+from extensions import db
+from models import LoginToken, RegisterToken, ResetToken
+
+# Login, registration and reset codes are single-use and short-lived, but rows
+# were never removed. The sweeper deletes dead rows in small batches, committing
+# after each one so a purge never holds SQLite's write lock for long.
+
+_sweeper = []
+_lock = threading.Lock()
+
+# Running totals for this process, reported by the CLI and the sweeper log line
+sweep_metrics = {
+    "runs": 0,
+    "reclaimed": {},
+    "last_run_at": None,
+    "last_duration_ms": None,
+    "last_reclaimed": 0,
+}
+
+
+def dead_token_filters(now=None):
+    """(label, model, condition) for every kind of row that can be deleted."""
+    now = now or datetime.utcnow()
+    return [
+        ("login_token", LoginToken, LoginToken.expires_at < now),
+        ("register_token", RegisterToken, RegisterToken.expires_at < now),
+        ("reset_token", ResetToken, ResetToken.used.is_(True)),
+        ("reset_token", ResetToken, ResetToken.used.is_(False) & (ResetToken.created_at < now - ResetToken.LIFETIME)),
+    ]
+
+
+def _delete_batch(model, condition, batch_size):
+    ids = select(model.id).where(condition).limit(batch_size).scalar_subquery()
+    result = db.session.execute(
+        delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def purge_dead_tokens(batch_size=500, pause=0.0, now=None):
+    """
+    Delete expired and used tokens, `batch_size` rows per transaction, sleeping
+    `pause` seconds between batches. Returns {table: rows_deleted}.
+    """
+    started = time.monotonic()
+    reclaimed = {}
+    for label, model, condition in dead_token_filters(now):
+        reclaimed.setdefault(label, 0)
+        while True:
+            deleted = _delete_batch(model, condition, batch_size)
+            reclaimed[label] += deleted
+            if deleted < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+    with _lock:
+        sweep_metrics["runs"] += 1
+        for label, count in reclaimed.items():
+            sweep_metrics["reclaimed"][label] = sweep_metrics["reclaimed"].get(label, 0) + count
+        sweep_metrics["last_run_at"] = datetime.utcnow().isoformat()
+        sweep_metrics["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        sweep_metrics["last_reclaimed"] = sum(reclaimed.values())
+    return reclaimed
+
+
+# -------------------
+# BACKGROUND SWEEPER
+# -------------------
+def _sweeper_loop(app, stop_event):
+    config = app.config
+    interval = config["TOKEN_GC_INTERVAL_SECONDS"]
+    # Spread the first run so several workers started together don't sweep at once
+    stop_event.wait(random.uniform(0, interval))
+    while not stop_event.is_set():
+        with app.app_context():
+            try:
+                reclaimed = purge_dead_tokens(config["TOKEN_GC_BATCH_SIZE"], config["TOKEN_GC_BATCH_PAUSE_SECONDS"])
+                reclaimed["otp_store"] = app.extensions["otp_store"].purge()
+                if any(reclaimed.values()):
+                    app.logger.info("Token sweep reclaimed %s in %sms", reclaimed, sweep_metrics["last_duration_ms"])
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception("Token sweep failed: %s", e)
+            finally:
+                db.session.remove()
+        stop_event.wait(interval)
+
+
+def start_token_sweeper(app):
+    stop_event = threading.Event()
+    t = threading.Thread(target=_sweeper_loop, args=(app, stop_event), name="token-sweeper", daemon=True)
+    t.start()
+    _sweeper.append(t)
+    return stop_event
+
+
+def init_token_sweeper(app):
+    """Start the sweeper thread on this process's first request (see mailer.init_email_queue)."""
+
+    @app.before_request
+    def _start_sweeper_once():
+        if _sweeper or not app.config["TOKEN_GC_INTERVAL_SECONDS"]:
+            return
+        with _lock:
+            if not _sweeper:
+                start_token_sweeper(app)
@@ -1,8 +1,5 @@
 # utils.py
-from flask_mail import Message
-from extensions import mail
-from flask import current_app
+from mailer import enqueue_email
 
 def send_email(to_email, subject, body):
-    msg = Message(subject=subject, recipients=[to_email], body=body)
-    mail.send(msg)
+    enqueue_email(subject=subject, recipients=[to_email], body=body)
@@ -1,13 +1,11 @@
 # utils/email_utils.py
-from flask_mail import Message
-from extensions import mail
+from mailer import enqueue_email
 from flask import current_app
 
 def send_email(to, subject, body):
-    msg = Message(
+    enqueue_email(
         subject=subject,
         recipients=[to],
         body=body,
         sender=current_app.config.get("MAIL_USERNAME")
     )
-    mail.send(msg)